@@ -0,0 +1,109 @@
+"""Read throughput of BlockShuffleSampler against RandomSampler on contiguous storage
+Usage: python benchmarks/block_shuffle.py [--format h5|mmap] [--samples n] [--sample_bytes b] [--path file]
+
+A synthetic file of variable-length samples stored one after the other is written first, either as an h5
+file of variable-length rows (the layout of the converted H5IBMGesture / INIRoshambo files) or as a raw
+memory mapped array with an offsets vector. The file is evicted from the page cache before every run
+(posix_fadvise), so reads hit the storage. Run it on the disk or network filesystem holding the datasets.
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+import torch
+from torch.utils import data
+from ebdataset.utils.samplers import BlockShuffleSampler
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--format", help="Storage of the samples", choices=("h5", "mmap"), default="h5")
+parser.add_argument("--path", help="Synthetic file to write and read", default="block_shuffle_benchmark.data")
+parser.add_argument("-n", "--samples", help="Number of samples", type=int, default=20000)
+parser.add_argument("--sample_bytes", help="Mean size of a sample in bytes", type=int, default=20000)
+parser.add_argument("-r", "--reads", help="Number of samples read per run", type=int, default=5000)
+parser.add_argument("--block_sizes", help="Block sizes to compare", type=int, nargs="+", default=[16, 64, 256])
+parser.add_argument("--buffer_size", help="Shuffle buffer of BlockShuffleSampler", type=int, default=1024)
+parser.add_argument("--keep", help="Keep the synthetic file", action="store_true")
+args = parser.parse_args()
+
+
+class H5Samples(data.Dataset):
+    def __init__(self, path):
+        import h5py
+
+        self.rows = h5py.File(path, "r")["samples"]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+
+class MmapSamples(data.Dataset):
+    def __init__(self, path):
+        self.offsets = np.load(path + ".offsets.npy")
+        self.events = np.memmap(path, dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return self.offsets.size - 1
+
+    def __getitem__(self, index):
+        return np.array(self.events[self.offsets[index] : self.offsets[index + 1]])
+
+
+def write_samples(path):
+    rand = np.random.RandomState(0x1B)
+    sizes = rand.randint(args.sample_bytes // 2, args.sample_bytes * 3 // 2, size=args.samples)
+    if args.format == "h5":
+        import h5py
+
+        with h5py.File(path, "w") as f:
+            rows = f.create_dataset("samples", (args.samples,), dtype=h5py.vlen_dtype(np.dtype("uint8")))
+            for i, size in enumerate(sizes):
+                rows[i] = rand.randint(0, 256, size=size, dtype=np.uint8)
+        return H5Samples
+
+    offsets = np.zeros(args.samples + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    np.save(path + ".offsets.npy", offsets)
+    with open(path, "wb") as f:
+        for size in sizes:
+            f.write(rand.randint(0, 256, size=size, dtype=np.uint8).tobytes())
+    return MmapSamples
+
+
+def drop_page_cache(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def measure(name, sampler):
+    drop_page_cache(args.path)
+    dataset = dataset_class(args.path)  # Reopened, mapped pages can't be evicted
+    indices = list(sampler)[: args.reads]
+    size = 0
+    start = time.perf_counter()
+    for index in indices:
+        size += dataset[index].nbytes
+    elapsed = time.perf_counter() - start
+    print("%-36s %9.1f samples/s %8.1f MB/s" % (name, len(indices) / elapsed, size / elapsed / 1e6))
+
+
+dataset_class = write_samples(args.path)
+samples = range(args.samples)
+print(
+    "%i samples of ~%i bytes, %s format, %i reads per run" % (args.samples, args.sample_bytes, args.format, args.reads)
+)
+try:
+    measure("RandomSampler", data.RandomSampler(samples, generator=torch.Generator().manual_seed(0)))
+    for block_size in args.block_sizes:
+        sampler = BlockShuffleSampler(samples, block_size=block_size, buffer_size=args.buffer_size)
+        measure("BlockShuffle(block=%i, buffer=%i)" % (block_size, args.buffer_size), sampler)
+    measure("Sequential", data.SequentialSampler(samples))
+finally:
+    if not args.keep:
+        os.remove(args.path)
+        if args.format == "mmap":
+            os.remove(args.path + ".offsets.npy")
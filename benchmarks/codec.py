@@ -0,0 +1,59 @@
+"""Compression ratio and decoding throughput of the compact event codec
+Usage: python benchmarks/codec.py [--events n] [--width w] [--height h] [--rate events/s]
+
+Without a dataset, a synthetic DVS-like stream (poisson arrivals at the given rate) is used.
+Pass a vision dataset name and path to measure on real samples instead.
+"""
+import argparse
+import time
+import numpy as np
+from ebdataset.vision import codec
+from ebdataset.vision.type import DVSSpikeTrain
+
+parser = argparse.ArgumentParser()
+parser.add_argument("dataset", nargs="?", help="Optional vision dataset class, e.g. H5IBMGesture")
+parser.add_argument("path", nargs="?", help="Path of the dataset")
+parser.add_argument("-n", "--events", help="Events per synthetic sample", type=int, default=1000000)
+parser.add_argument("--width", type=int, default=128)
+parser.add_argument("--height", type=int, default=128)
+parser.add_argument("--rate", help="Synthetic event rate (events/s)", type=float, default=300000.0)
+parser.add_argument("-s", "--samples", help="Number of samples", type=int, default=10)
+args = parser.parse_args()
+
+if args.dataset is not None:
+    import ebdataset.vision
+
+    dataset = getattr(ebdataset.vision, args.dataset)(args.path)
+    indices = np.random.RandomState(0x1B).choice(len(dataset), size=min(args.samples, len(dataset)), replace=False)
+    samples = [dataset[i][0] for i in indices]
+else:
+    rand = np.random.RandomState(0x1B)
+    samples = []
+    for _ in range(args.samples):
+        spike_train = DVSSpikeTrain(args.events)
+        spike_train.x = rand.randint(0, args.width, args.events)
+        spike_train.y = rand.randint(0, args.height, args.events)
+        spike_train.p = rand.randint(0, 2, args.events)
+        spike_train.ts = np.cumsum(rand.exponential(1e6 / args.rate, args.events)).astype(np.uint64)
+        samples.append(spike_train)
+
+raw_bytes = sum(sample.nbytes for sample in samples)
+nb_events = sum(len(sample) for sample in samples)
+
+start = time.perf_counter()
+encoded = [codec.encode(sample) for sample in samples]
+encode_time = time.perf_counter() - start
+
+start = time.perf_counter()
+for buffer in encoded:
+    codec.decode(buffer)
+decode_time = time.perf_counter() - start
+
+encoded_bytes = sum(buffer.nbytes for buffer in encoded)
+print("Events: %i in %i samples" % (nb_events, len(samples)))
+print(
+    "Size: %.1f MB -> %.1f MB (ratio %.2fx, %.2f bytes/event)"
+    % (raw_bytes / 1e6, encoded_bytes / 1e6, raw_bytes / encoded_bytes, encoded_bytes / nb_events)
+)
+print("Encode: %.1f M events/s" % (nb_events / encode_time / 1e6))
+print("Decode: %.1f M events/s" % (nb_events / decode_time / 1e6))
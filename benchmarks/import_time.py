@@ -0,0 +1,38 @@
+"""Guard the startup cost of `import ebdataset`
+Usage: python benchmarks/import_time.py [--budget seconds] [--repeat n]
+
+Each measurement runs in a fresh interpreter. The script fails if one of the heavy
+dependencies is imported eagerly or if the median import time exceeds the budget.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("torch", "torchvision", "h5py", "pint", "tqdm", "scipy", "numpy")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import ebdataset
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-b", "--budget", help="Maximum median import time (s)", type=float, default=0.1)
+parser.add_argument("-r", "--repeat", help="Number of fresh interpreters to measure", type=int, default=10)
+args = parser.parse_args()
+
+timings = []
+for _ in range(args.repeat):
+    result = json.loads(subprocess.check_output([sys.executable, "-c", _PROBE]))
+    if result["loaded"]:
+        sys.exit("import ebdataset eagerly loaded: %s" % ", ".join(result["loaded"]))
+    timings.append(result["elapsed"])
+
+median = statistics.median(timings)
+print("import ebdataset: median %.1f ms, min %.1f ms over %i runs" % (1e3 * median, 1e3 * min(timings), args.repeat))
+if median > args.budget:
+    sys.exit("Import time above budget of %.1f ms" % (1e3 * args.budget))
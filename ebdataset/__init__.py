@@ -1,5 +1,14 @@
-import ebdataset.vision as vision
-import ebdataset.audio as audio
-import ebdataset.generated as generated
-import ebdataset.bci as bci
-from .utils.units import *
+"""Event based dataset loaders under one common API
+
+Subpackages and units are imported lazily on first attribute access to keep `import ebdataset` fast,
+heavy dependencies (torch, h5py, pint, scipy...) are only loaded once a dataset is actually used.
+"""
+from .utils import units as _units
+from .utils.lazy import lazy_attributes
+
+_SUBPACKAGES = ("vision", "audio", "generated", "bci", "visualization")
+_LAZY_ATTRIBUTES = {name: ".utils.units" for name in _units.__all__}
+
+__all__ = list(_SUBPACKAGES) + list(_LAZY_ATTRIBUTES)
+
+__getattr__, __dir__ = lazy_attributes(__name__, _LAZY_ATTRIBUTES, submodules=_SUBPACKAGES)
@@ -1,2 +1,10 @@
 """This subpackage regroups audio-based spiking dataset"""
-from .ntidigits import NTidigits
+from ..utils.lazy import lazy_attributes
+
+_LAZY_ATTRIBUTES = {
+    "NTidigits": ".ntidigits",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+__getattr__, __dir__ = lazy_attributes(__name__, _LAZY_ATTRIBUTES)
@@ -2,6 +2,7 @@ import os
 import numpy as np
 from h5py import File
 from torch.utils import data
+from ..utils.shared import SharedEvents
 
 
 class NTidigits(data.Dataset):
@@ -10,38 +11,135 @@ class NTidigits(data.Dataset):
     Frontiers in Neuroscience, vol. 12, Feb. 2018, p. 23. DOI.org (Crossref), doi:10.3389/fnins.2018.00023.
 
     Available for download at https://docs.google.com/document/d/1Uxe7GsKKXcy6SlDUX4hoJVAC0-UkH-8kr5UXp0Ndi1M
+
+    Reads both the original h5 file (one dataset per utterance) and the flat layout created by NTidigits.convert
+    (one address array, one timestamp array and an offsets vector per split), which is much faster to read.
+    With preload="shared", the whole split is loaded once into shared memory and shared by the DataLoader workers.
     """
 
-    def __init__(self, path: str, is_train=True, transforms=None, only_single_digits=False):
+    _FLAT_LAYOUT = "flat"
+
+    def __init__(self, path: str, is_train=True, transforms=None, only_single_digits=False, preload: str = None):
         assert os.path.exists(path)
+        assert preload in (None, "shared"), "Unknown preload mode %s" % preload
         self.prename = "train" if is_train else "test"
         self.path = path
         self.transforms = transforms
 
         with File(path, "r") as f:
+            self.is_flat = f.attrs.get("layout", None) == self._FLAT_LAYOUT
             self.samples = f[self.prename + "_labels"][()]
+            if self.is_flat:
+                self._offsets = f[self.prename + "_offsets"][()]
+                label_lengths = f[self.prename + "_label_lengths"][()]
+            else:
+                label_lengths = np.char.str_len(NTidigits._get_labels(self.samples))
 
+        self._indices = np.arange(len(self.samples))  # Position of the samples in the split
         if only_single_digits:
-            self.samples = list(filter(lambda s: len(NTidigits._get_label_for_sample(s)) == 1, self.samples))
+            self._indices = np.flatnonzero(label_lengths == 1)
+            self.samples = self.samples[self._indices]
+        self._labels = NTidigits._get_labels(self.samples)
+
+        self._shared = None
+        if preload == "shared":
+            addresses, timestamps, offsets, labels = self.load_all()
+            events = np.recarray(addresses.size, dtype=[("addr", addresses.dtype), ("ts", timestamps.dtype)])
+            events.addr = addresses
+            events.ts = timestamps
+            self._shared = SharedEvents(events, offsets, labels)
 
     @staticmethod
     def _get_label_for_sample(sample_id):
         return sample_id.decode("utf-8").split("-")[-1]
 
+    @staticmethod
+    def _get_labels(sample_ids) -> np.ndarray:
+        """Vectorized _get_label_for_sample"""
+        return np.char.decode(np.char.rpartition(np.asarray(sample_ids, dtype=bytes), b"-")[..., 2], "utf-8")
+
+    @staticmethod
+    def convert(path: str, out_path: str, verbose=True):
+        """Convert the original NTidigits h5 file to the flat layout
+
+        Arguments:
+            path {str} -- Path of the original h5 file
+            out_path {str} -- Path of the output h5 file
+        """
+        from tqdm import tqdm
+
+        with File(path, "r") as f_in, File(out_path, "w-") as f_out:
+            f_out.attrs["layout"] = NTidigits._FLAT_LAYOUT
+            for prename in ("train", "test"):
+                sample_ids = f_in[prename + "_labels"][()]
+                addresses, timestamps = [], []
+                for sample_id in tqdm(sample_ids, desc="Converting %s split" % prename, disable=not verbose):
+                    addresses.append(f_in[prename + "_addresses"][sample_id][()])
+                    timestamps.append(f_in[prename + "_timestamps"][sample_id][()])
+
+                offsets = np.zeros(len(sample_ids) + 1, dtype=np.int64)
+                np.cumsum([len(ts) for ts in timestamps], out=offsets[1:])
+
+                f_out[prename + "_labels"] = sample_ids
+                f_out[prename + "_label_lengths"] = np.char.str_len(NTidigits._get_labels(sample_ids))
+                f_out[prename + "_offsets"] = offsets
+                f_out[prename + "_addresses"] = np.concatenate(addresses)
+                f_out[prename + "_timestamps"] = np.concatenate(timestamps)
+
+    def load_all(self):
+        """Load every sample of the split at once
+
+        Returns:
+            tuple -- (addresses, timestamps, offsets, labels) where the events of sample i
+            are addresses[offsets[i]:offsets[i + 1]] and timestamps[offsets[i]:offsets[i + 1]]
+        """
+        with File(self.path, "r") as f:
+            if self.is_flat:
+                addresses = f[self.prename + "_addresses"][()]
+                timestamps = f[self.prename + "_timestamps"][()]
+                starts, ends = self._offsets[self._indices], self._offsets[self._indices + 1]
+            else:
+                addresses = [f[self.prename + "_addresses"][sample_id][()] for sample_id in self.samples]
+                timestamps = [f[self.prename + "_timestamps"][sample_id][()] for sample_id in self.samples]
+                ends = np.cumsum([len(ts) for ts in timestamps])
+                starts = ends - [len(ts) for ts in timestamps]
+                addresses, timestamps = np.concatenate(addresses), np.concatenate(timestamps)
+
+        offsets = np.zeros(len(self.samples) + 1, dtype=np.int64)
+        np.cumsum(ends - starts, out=offsets[1:])
+        if offsets[-1] != addresses.size:  # Some samples were filtered out, gather the selected ranges
+            selection = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - starts, ends - starts)
+            addresses, timestamps = addresses[selection], timestamps[selection]
+
+        return addresses, timestamps, offsets, self._labels
+
     def __len__(self):
         return len(self.samples)
 
-    def __getitem__(self, index):
-        sample_id = self.samples[index]
+    def _load(self, index):
         with File(self.path, "r") as f:
-            addresses = f[self.prename + "_addresses"][sample_id][()]
-            ts = f[self.prename + "_timestamps"][sample_id][()]
+            if self.is_flat:
+                position = self._indices[index]
+                start, end = self._offsets[position], self._offsets[position + 1]
+                addresses = f[self.prename + "_addresses"][start:end]
+                ts = f[self.prename + "_timestamps"][start:end]
+            else:
+                sample_id = self.samples[index]
+                addresses = f[self.prename + "_addresses"][sample_id][()]
+                ts = f[self.prename + "_timestamps"][sample_id][()]
 
         sparse_spike_train = np.recarray(shape=len(ts), dtype=[("addr", addresses.dtype), ("ts", ts.dtype)])
         sparse_spike_train.addr = addresses
         sparse_spike_train.ts = ts
+        return sparse_spike_train, self._labels[index]
+
+    def __getitem__(self, index):
+        if self._shared is not None:
+            sparse_spike_train, label = self._shared[index]
+        else:
+            sparse_spike_train, label = self._load(index)
 
         if self.transforms is not None:
             sparse_spike_train = self.transforms(sparse_spike_train)
 
-        return sparse_spike_train, NTidigits._get_label_for_sample(sample_id)
+        return sparse_spike_train, label
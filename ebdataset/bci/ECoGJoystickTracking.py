@@ -1,8 +1,10 @@
+import hashlib
 import os
 import numpy as np
 from torch.utils import data
 from scipy.io import loadmat
 from ..utils.units import Hz
+from ..utils.cache import DiskCache, transform_hash
 
 
 class ECoGJoystickTracking(data.Dataset):
@@ -12,20 +14,34 @@ class ECoGJoystickTracking(data.Dataset):
     Ethics statement: All patients participated in a purely voluntary manner, after providing informed written consent, under experimental protocols approved by the Institutional Review Board of the University of Washington (#12193). All patient data was anonymized according to IRB protocol, in accordance with HIPAA mandate. It was made available through the library described in “A Library of Human Electrocorticographic Data and Analyses” by Kai Miller [Reference], freely available at https://searchworks.stanford.edu/view/zk881ps0522
     """
 
-    def __init__(self, path, transforms=None, users=["fp", "gf", "rh", "rr"]):
+    def __init__(self, path, transforms=None, users=["fp", "gf", "rh", "rr"], cache_dir=None):
+        """
+        path: directory of the dataset
+        transforms: transforms applied to the electrode data (time x n_electrode), e.g. bci.filters.ChunkedFilter
+        users: subjects to load
+        cache_dir: directory where the transformed electrode data is cached, keyed by the recording and
+        the parameters of the transforms (optional)
+        """
         assert os.path.exists(path), f"Data not found at '{path}'"
         self.path = path
         self.transforms = transforms
         self.fs = 1000 * Hz  # Sampling frequency
         self.users = users
+        self._cache = DiskCache(cache_dir) if cache_dir is not None else None
+        self._nsfilt = None
 
     @property
     def nsfilt(self):
-        # amplitude roll-off function used for filtering
-        return loadmat(os.path.join(self.path, "ns_1k_1_300_filt.mat"))["nsfilt"]
+        # amplitude roll-off function used for filtering, loaded once
+        if self._nsfilt is None:
+            self._nsfilt = loadmat(os.path.join(self.path, "ns_1k_1_300_filt.mat"))["nsfilt"]
+        return self._nsfilt
+
+    def _mat_path(self, index):
+        return os.path.join(self.path, "data", f"{self.users[index]}_joystick.mat")
 
     def _loadmat(self, index):
-        return loadmat(os.path.join(self.path, "data", f"{self.users[index]}_joystick.mat"))
+        return loadmat(self._mat_path(index))
 
     def electrode_positions(self, index):
         # Talairach coordinate systems for the 60 electrodes
@@ -37,5 +53,17 @@ class ECoGJoystickTracking(data.Dataset):
     def __getitem__(self, index):
         """Return electrode data (n_electrode x time) and labels (4 x time), with labels = (x, y, target_x, target_y)"""
         mat = self._loadmat(index)
-        data = mat["data"] if self.transforms is None else self.transforms(mat["data"])
+        if self.transforms is None:
+            data = mat["data"]
+        elif self._cache is None:
+            data = self.transforms(mat["data"])
+        else:
+            stat = os.stat(self._mat_path(index))
+            transforms_hash = transform_hash(self.transforms)
+            identity = "%s:%i:%i:%s" % (self.users[index], stat.st_size, stat.st_mtime_ns, transforms_hash)
+            key = hashlib.sha1(identity.encode("utf-8")).hexdigest()
+            data = self._cache.get(key)
+            if data is None:
+                data = self.transforms(mat["data"])
+                self._cache.put(key, data)
         return data.T, np.stack((mat["CursorPosX"], mat["CursorPosY"], mat["TargetPosX"], mat["TargetPosY"])).squeeze()
@@ -1 +1,10 @@
-from .ECoGJoystickTracking import ECoGJoystickTracking
+"""This subpackage regroups brain-computer interface datasets"""
+from ..utils.lazy import lazy_attributes
+
+_LAZY_ATTRIBUTES = {
+    "ECoGJoystickTracking": ".ECoGJoystickTracking",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+__getattr__, __dir__ = lazy_attributes(__name__, _LAZY_ATTRIBUTES)
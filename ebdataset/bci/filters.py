@@ -0,0 +1,107 @@
+"""Streaming filters for multichannel recordings such as ECoG (time x channels)
+
+The filters keep their state between chunks, so filtering a recording chunk by chunk gives the same output
+as filtering it at once, with memory bounded by the chunk size. Every channel is filtered in the same call.
+
+Usage:
+    transforms = ChunkedFilter(SOSFilter(bandpass(1 * Hz, 200 * Hz, 1000 * Hz)), SOSFilter(notch(60 * Hz, 1000 * Hz)))
+    dataset = ECoGJoystickTracking(path, transforms=transforms)
+"""
+import numpy as np
+from scipy import signal
+from ..utils.units import Hz, wunits
+
+
+@wunits(None, (Hz, Hz, Hz, None), False)
+def bandpass(low, high, fs, order: int = 4) -> np.ndarray:
+    """Butterworth band-pass filter as second-order sections"""
+    return signal.butter(order, (low, high), btype="bandpass", fs=fs, output="sos")
+
+
+@wunits(None, (Hz, Hz, None), False)
+def notch(frequency, fs, quality: float = 30.0) -> np.ndarray:
+    """Notch filter removing frequency (e.g. line noise), as second-order sections"""
+    b, a = signal.iirnotch(frequency, quality, fs=fs)
+    return signal.tf2sos(b, a)
+
+
+class SOSFilter(object):
+    """Stateful IIR filter in second-order sections, filtering consecutive chunks of a recording along time"""
+
+    _volatile_attributes = ("_zi",)  # Ignored by utils.cache.transform_hash
+
+    def __init__(self, sos):
+        """
+        Arguments:
+            sos {np.ndarray} -- Second-order sections of shape (n_sections, 6), e.g. from bandpass or notch
+        """
+        self.sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+        self._zi = None
+
+    def reset(self):
+        self._zi = None
+
+    def __call__(self, chunk: np.ndarray) -> np.ndarray:
+        """Filter the next chunk of shape (time, channels)"""
+        if self._zi is None:
+            self._zi = np.zeros((self.sos.shape[0], 2) + chunk.shape[1:])
+        filtered, self._zi = signal.sosfilt(self.sos, chunk, axis=0, zi=self._zi)
+        return filtered
+
+
+class FIRFilter(object):
+    """FIR filter applied with overlap-add, filtering consecutive chunks of a recording along time"""
+
+    _volatile_attributes = ("_tail",)  # Ignored by utils.cache.transform_hash
+
+    def __init__(self, taps):
+        """
+        Arguments:
+            taps {np.ndarray} -- Coefficients of the filter, e.g. from scipy.signal.firwin
+        """
+        self.taps = np.asarray(taps, dtype=np.float64)
+        self._tail = None
+
+    def reset(self):
+        self._tail = None
+
+    def __call__(self, chunk: np.ndarray) -> np.ndarray:
+        """Filter the next chunk of shape (time, channels)"""
+        taps = self.taps.reshape((-1,) + (1,) * (chunk.ndim - 1))
+        full = signal.oaconvolve(chunk, taps, mode="full", axes=0)
+        if self._tail is not None:  # Overlap of the previous chunks
+            overlap = min(self._tail.shape[0], full.shape[0])
+            full[:overlap] += self._tail[:overlap]
+            if self._tail.shape[0] > full.shape[0]:  # Chunk shorter than the filter, carry the rest over
+                full = np.concatenate((full, self._tail[full.shape[0] :]))
+        length = chunk.shape[0]
+        self._tail = full[length:]
+        return full[:length]
+
+
+class ChunkedFilter(object):
+    """Transform filtering a whole recording (time x channels) through a chain of stream filters,
+    one fixed-size time chunk at a time. The output is the same as filtering the whole array at once."""
+
+    def __init__(self, *filters, chunk_size: int = 10000):
+        """
+        Arguments:
+            filters -- SOSFilter or FIRFilter applied in order
+
+        Keyword Arguments:
+            chunk_size {int} -- Number of time steps per chunk (default: {10000})
+        """
+        self.filters = filters
+        self.chunk_size = chunk_size
+
+    def __call__(self, data: np.ndarray) -> np.ndarray:
+        for stream_filter in self.filters:
+            stream_filter.reset()
+
+        out = np.empty(data.shape, dtype=np.result_type(data.dtype, np.float64))
+        for start in range(0, data.shape[0], self.chunk_size):
+            chunk = data[start : start + self.chunk_size]
+            for stream_filter in self.filters:
+                chunk = stream_filter(chunk)
+            out[start : start + self.chunk_size] = chunk
+        return out
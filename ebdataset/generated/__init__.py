@@ -1,2 +1,10 @@
 """This subpackage regroups self-generated spiking dataset"""
-from .parity import ParityTask
\ No newline at end of file
+from ..utils.lazy import lazy_attributes
+
+_LAZY_ATTRIBUTES = {
+    "ParityTask": ".parity",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+__getattr__, __dir__ = lazy_attributes(__name__, _LAZY_ATTRIBUTES)
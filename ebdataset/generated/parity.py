@@ -1,6 +1,7 @@
 import numpy as np
 import torch.utils.data as data
 from ..utils.units import hertz, ms, second, wunits
+from ..utils.sharding import get_shard_info, shard_seed
 
 
 class ParityTask(data.IterableDataset):
@@ -9,6 +10,8 @@ class ParityTask(data.IterableDataset):
     each HIGH bits is encoded with high_freq poisson-sampled spikes of shape features_per_bit x duration_per_bit
     LOW bits and background-noise is encoded with low_freq poisson-sampled spikes for the remaining of the sample_duration
     bits are encoded both temporally and spatially if sequential=True, otherwise only spatially
+    when used with multiple DataLoader workers or distributed ranks, each (rank, worker) pair generates its own stream
+    and max_iter is split between them. Use set_epoch to get a different, reproducible stream every epoch
     """
 
     @wunits(None, (None, None, hertz, hertz, second, None, None, second, second, None, None, None))
@@ -37,20 +40,26 @@ class ParityTask(data.IterableDataset):
         self.features_per_bit = features_per_bit
         self.as_recarray = as_recarray
         self.sequential = sequential
+        self.epoch = None
         if sequential:
             assert (
                 duration_per_bit * number_of_bits <= sample_duration
             ), "Sample duration is not enough to contain every bits"
 
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
     def __iter__(self):
-        worker_info = data.get_worker_info()
-        m = 1
-        if worker_info is not None:  # multi-process data loading, re-seed the iterator
-            self.rand = np.random.RandomState(seed=worker_info.id + self.seed)
-            m = worker_info.num_workers
+        shard = get_shard_info()
+        if shard.count > 1 or self.epoch is not None:  # multi-process or distributed loading, re-seed the iterator
+            self.rand = np.random.RandomState(seed=shard_seed(self.seed, self.epoch or 0, shard))
+
+        max_iter = self.max_iter
+        if not np.isinf(max_iter):  # Split the samples between shards
+            max_iter = max_iter // shard.count + (shard.index < max_iter % shard.count)
 
         i = 0
-        while i < self.max_iter / m:
+        while i < max_iter:
             i += 1
 
             bits = self.rand.randint(0, 2, size=self.number_of_bits)
@@ -1,10 +1,19 @@
-from pathlib import Path, PurePath
-import urllib.request
-from zipfile import ZipFile
-from tqdm import tqdm
+import os
+import posixpath
+import shutil
+import tarfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from zipfile import ZipFile, is_zipfile
 
 
 def download(url, download_path, verbose=True, block_size=2048, desc="Downloading"):
+    import urllib.request
+    from tqdm import tqdm
+
     res = urllib.request.urlopen(url)
     size = int(res.info().get("Content-Length", -1))
     if size == -1:
@@ -24,21 +33,231 @@ def download(url, download_path, verbose=True, block_size=2048, desc="Downloadin
     return True
 
 
-def unzip(zip_file_path, output_directory, verbose=True, desc="Extracting"):
-    with ZipFile(zip_file_path, "r") as zf:
-        size = sum((f.file_size for f in zf.infolist()))
-        with tqdm(
-            total=size,
-            unit="B",
-            unit_scale=True,
-            desc=desc,
-            disable=not verbose,
-        ) as pbar:
-            for file in zf.infolist():
-                if file.is_dir():
-                    continue
-                path = PurePath(output_directory).joinpath(file.filename)
-                Path(path.parent).mkdir(parents=True, exist_ok=True)
-                zf.extract(member=file, path=path)
-                pbar.update(file.file_size)
+_COPY_BUFFER_SIZE = 1 << 20  # Bytes copied at once from an archive member to its file
+_CHUNK_MEMBERS = 256  # Members extracted per task, a task is also the unit of progress reporting
+_local = threading.local()
+
+
+def _safe_path(output_directory: str, name: str) -> str:
+    """Destination of an archive member, refusing members escaping the output directory (zip slip)
+
+    Links are never extracted, so normalizing the path is enough, without resolving it on the filesystem.
+    """
+    path = os.path.normpath(os.path.join(output_directory, name))
+    if not path.startswith(output_directory + os.sep) and path != output_directory:
+        raise ValueError("Archive member %s would be extracted outside of %s" % (name, output_directory))
+    return path
+
+
+def _zip_handle(path: str) -> ZipFile:
+    """ZipFile of path opened once per thread (and process), workers must not share file offsets"""
+    handles = getattr(_local, "zip_handles", None)
+    if handles is None:
+        handles = _local.zip_handles = {}
+    if path not in handles:
+        handles[path] = ZipFile(path, "r")
+    return handles[path]
+
+
+def _extract_zip_members(args) -> int:
+    archive_path, members, buffer_size = args
+    zf = _zip_handle(archive_path)
+    size = 0
+    for name, destination in members:
+        with zf.open(name) as f_src, open(destination, "wb") as f_dst:
+            shutil.copyfileobj(f_src, f_dst, buffer_size)
+        size += zf.getinfo(name).file_size
+    return size
+
+
+def _zip_tasks(archive_path: str, output_directory: str, num_workers: int, buffer_size: int):
+    """Directories and balanced tasks of (member, destination) to extract"""
+    with ZipFile(archive_path, "r") as zf:
+        infos = zf.infolist()
+    directories = set()
+    files = []
+    for info in infos:
+        path = _safe_path(output_directory, info.filename)
+        if info.is_dir():
+            directories.add(path)
+        else:
+            directories.add(os.path.dirname(path))
+            files.append((info.file_size, info.filename, path))
+
+    # Largest members first, dealt round-robin so that every task gets a similar amount of bytes
+    files.sort(key=lambda file: file[0], reverse=True)
+    nb_tasks = max(num_workers, -(-len(files) // _CHUNK_MEMBERS))
+    tasks = [
+        (archive_path, [(name, path) for _, name, path in files[i::nb_tasks]], buffer_size) for i in range(nb_tasks)
+    ]
+    return directories, [task for task in tasks if task[1]], sum(file[0] for file in files), len(files)
+
+
+def _write_file(args) -> int:
+    destination, payload = args
+    with open(destination, "wb") as f_dst:
+        f_dst.write(payload)
+    return len(payload)
+
+
+def _extract_tar(archive_path, output_directory, num_workers, buffer_size, pbar) -> tuple:
+    """Stream the members of a (possibly compressed) tar archive, writing the files from a thread pool"""
+    nb_files = size = 0
+    directories = set()
+    pending = deque()
+    with tarfile.open(archive_path, "r|*", bufsize=buffer_size) as tf, ThreadPoolExecutor(num_workers) as executor:
+        for member in tf:
+            path = _safe_path(output_directory, member.name)
+            if member.isdir():
+                os.makedirs(path, exist_ok=True)
+                continue
+            if not member.isfile():  # Links and devices are never extracted
+                continue
+            if os.path.dirname(path) not in directories:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                directories.add(os.path.dirname(path))
+            pending.append(executor.submit(_write_file, (path, tf.extractfile(member).read())))
+            if len(pending) >= 4 * num_workers:  # Bounds the memory held by pending payloads
+                written = pending.popleft().result()
+                size += written
+                pbar.update(written)
+            nb_files += 1
+        while pending:
+            written = pending.popleft().result()
+            size += written
+            pbar.update(written)
+    return nb_files, size
+
+
+def extract_archive(
+    archive_path,
+    output_directory,
+    verbose=True,
+    desc="Extracting",
+    num_workers: int = None,
+    kind: str = "thread",
+    buffer_size: int = _COPY_BUFFER_SIZE,
+) -> dict:
+    """Extract a zip or tar archive in parallel
+
+    Directories are created in a single pass before extraction, members are copied with large buffers.
+    Zip members are extracted by a pool of workers, each with its own handle on the archive.
+    Tar archives can only be read sequentially: members are streamed and their files written by a thread pool.
+    Members with a path outside of output_directory are refused.
+
+    Arguments:
+        archive_path {str} -- Path of the zip or tar (.tar, .tar.gz, .tgz, .tar.bz2, .tar.xz) archive
+        output_directory {str} -- Directory to extract to, created if needed
+
+    Keyword Arguments:
+        verbose {bool} -- Show a progress bar and the throughput (default: {True})
+        desc {str} -- Description of the progress bar (default: {"Extracting"})
+        num_workers {int} -- Number of workers (default: {None}, up to 8 depending on the number of cpus)
+        kind {str} -- "thread" or "process" workers for zip archives (default: {"thread"})
+        buffer_size {int} -- Size of the copy buffer in bytes (default: {1 MiB})
+
+    Returns:
+        dict -- Number of files, bytes written, seconds and throughput in bytes per second
+    """
+    from tqdm import tqdm
+
+    assert kind in ("thread", "process"), "Unknown worker kind %s" % kind
+    num_workers = num_workers or min(8, os.cpu_count() or 1)
+    output_directory = os.path.realpath(output_directory)
+    os.makedirs(output_directory, exist_ok=True)
+    start = time.perf_counter()
+
+    if is_zipfile(archive_path):
+        directories, tasks, total, nb_files = _zip_tasks(archive_path, output_directory, num_workers, buffer_size)
+        for directory in sorted(directories):
+            os.makedirs(directory, exist_ok=True)
+        executor_class = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+        with tqdm(total=total, unit="B", unit_scale=True, desc=desc, disable=not verbose) as pbar:
+            with executor_class(max_workers=num_workers) as executor:
+                for done in as_completed([executor.submit(_extract_zip_members, task) for task in tasks]):
+                    pbar.update(done.result())
+        size = total
+    elif tarfile.is_tarfile(archive_path):
+        with tqdm(unit="B", unit_scale=True, desc=desc, disable=not verbose) as pbar:
+            nb_files, size = _extract_tar(archive_path, output_directory, num_workers, buffer_size, pbar)
+    else:
+        raise ValueError("%s is neither a zip nor a tar archive" % archive_path)
+
+    elapsed = time.perf_counter() - start
+    stats = {"files": nb_files, "bytes": size, "seconds": elapsed, "bytes_per_second": size / max(elapsed, 1e-9)}
+    if verbose:
+        print(
+            "Extracted %i files (%.1f MB) in %.2fs, %.1f MB/s"
+            % (nb_files, size / 1e6, elapsed, stats["bytes_per_second"] / 1e6)
+        )
+    return stats
+
+
+def unzip(zip_file_path, output_directory, verbose=True, desc="Extracting", num_workers: int = None):
+    """Extract a zip (or tar) archive in output_directory, see extract_archive"""
+    extract_archive(zip_file_path, output_directory, verbose=verbose, desc=desc, num_workers=num_workers)
     return True
+
+
+def is_archive(path) -> bool:
+    """Return True if path points to a zip archive that can be read without extraction"""
+    return os.path.isfile(path) and is_zipfile(path)
+
+
+class ZipReader(object):
+    """Read members of a zip archive without extracting them
+
+    The archive is opened lazily and a single handle is kept per process,
+    so the reader can be shared with DataLoader workers (forked or spawned)
+    without them fighting over the same file offset.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+        self._pid = None
+
+    def _zip_file(self) -> ZipFile:
+        if self._handle is None or self._pid != os.getpid():
+            self._handle = ZipFile(self.path, "r")
+            self._pid = os.getpid()
+        return self._handle
+
+    def list_files(self, extension: str, split: str = None):
+        """List the members ending with extension, along with the name of their parent directory
+
+        Arguments:
+            extension {str} -- File extension of the samples (e.g. ".bin")
+
+        Keyword Arguments:
+            split {str} -- Only keep members having this directory in their path (default: {None})
+
+        Returns:
+            tuple -- (member names, parent directory names)
+        """
+        files = []
+        labels = []
+        for info in self._zip_file().infolist():
+            if info.is_dir() or not info.filename.endswith(extension):
+                continue
+            directory = posixpath.dirname(info.filename)
+            if split is not None and split not in directory.split("/"):
+                continue
+            files.append(info.filename)
+            labels.append(posixpath.basename(directory))
+        return files, labels
+
+    def read(self, name: str) -> bytes:
+        return self._zip_file().read(name)
+
+    def close(self):
+        if self._handle is not None and self._pid == os.getpid():
+            self._handle.close()
+        self._handle = None
+        self._pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_handle"] = None
+        state["_pid"] = None
+        return state
@@ -0,0 +1,116 @@
+"""Asyncio facade over map-style datasets, for serving samples from an event loop"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _LoopState(object):
+    """Request state bound to an event loop: the semaphore bounding the reads and the reads in flight"""
+
+    def __init__(self, max_pending: int):
+        self.semaphore = asyncio.Semaphore(max_pending)
+        self.in_flight = {}
+
+
+class AsyncDataset(object):
+    """Load samples of a map-style dataset without blocking the event loop
+
+    Blocking reads and decoding run in a bounded executor: a thread pool by default, which suits
+    file and HDF5 I/O, or any concurrent.futures executor (e.g. a ProcessPoolExecutor for CPU bound decoding,
+    in which case the dataset is pickled with every request).
+
+    Concurrent requests for the same index are coalesced into a single read, and at most max_pending
+    reads are submitted to the executor at once, the other requests wait on the event loop.
+    The dataset can be used from several event loops (e.g. successive asyncio.run calls),
+    requests are only coalesced and bounded within a loop.
+
+    Usage:
+        async with AsyncDataset(NMnist(path)) as dataset:
+            spike_train, label = await dataset.aget(0)
+            async for batch in dataset.batches(range(100), batch_size=8):
+                ...
+    """
+
+    def __init__(self, dataset, executor=None, max_workers: int = 4, max_pending: int = None):
+        """
+        Arguments:
+            dataset -- Map-style dataset
+
+        Keyword Arguments:
+            executor -- concurrent.futures executor running the reads, owned by the caller (default: {None})
+            max_workers {int} -- Number of threads of the default executor (default: {4})
+            max_pending {int} -- Maximum number of reads submitted at once (default: {2 * max_workers})
+        """
+        self.dataset = dataset
+        self._own_executor = executor is None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if executor is None else executor
+        self.max_pending = max_pending or 2 * max_workers
+        self._loops = {}  # Event loop => _LoopState
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def _loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            # The state references its loop, so closed loops are dropped explicitly
+            self._loops = {other: state for other, state in self._loops.items() if not other.is_closed()}
+            state = self._loops[loop] = _LoopState(self.max_pending)
+        return state
+
+    async def _load(self, index, semaphore):
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.dataset.__getitem__, index)
+
+    async def aget(self, index):
+        """Load a sample, equivalent of dataset[index]"""
+        state = self._loop_state()
+        future = state.in_flight.get(index)
+        if future is None:
+            future = asyncio.ensure_future(self._load(index, state.semaphore))
+            state.in_flight[index] = future
+            future.add_done_callback(lambda _: state.in_flight.pop(index, None))
+        # Shielded so that a cancelled request doesn't cancel the read for the other requests of the same index
+        return await asyncio.shield(future)
+
+    async def aget_many(self, indices) -> list:
+        """Load several samples concurrently, in the order of indices"""
+        return await asyncio.gather(*(self.aget(index) for index in indices))
+
+    async def batches(self, indices=None, batch_size: int = 1, prefetch: int = 2, collate_fn=None):
+        """Asynchronous iterator over batches of samples
+
+        Keyword Arguments:
+            indices {iterable} -- Indices to load, every sample of the dataset by default (default: {None})
+            batch_size {int} -- Number of samples per batch (default: {1})
+            prefetch {int} -- Number of batches loaded ahead of the consumer (default: {2})
+            collate_fn {callable} -- Function applied to the list of samples of a batch (default: {None})
+
+        Yields:
+            list -- Batch of samples, or the output of collate_fn
+        """
+        indices = list(range(len(self.dataset)) if indices is None else indices)
+        pending = []
+        try:
+            for start in range(0, len(indices), batch_size):
+                pending.append(asyncio.ensure_future(self.aget_many(indices[start : start + batch_size])))
+                if len(pending) > prefetch:
+                    batch = await pending.pop(0)
+                    yield batch if collate_fn is None else collate_fn(batch)
+            while pending:
+                batch = await pending.pop(0)
+                yield batch if collate_fn is None else collate_fn(batch)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,178 @@
+"""Export datasets to Apache Arrow IPC (Feather v2) files and read them back through memory mapping
+
+Requires pyarrow (pip install ebdataset[arrow]).
+Each row of the file is a sample. Events are stored either as a single list<struct> column ("struct" layout)
+or as one list column per event field sharing the same offsets ("columns" layout). Labels and per-sample
+metadata (width, height, duration, time_scale) are ordinary columns.
+"""
+import json
+import os
+import numpy as np
+import pyarrow as pa
+from torch.utils import data
+from ..vision.type import DVSSpikeTrain
+
+_METADATA_COLUMNS = ("width", "height", "duration", "time_scale")
+_EVENTS_COLUMN = "events"
+_LABEL_COLUMN = "label"
+
+
+def _to_arrow_values(values: np.ndarray) -> pa.Array:
+    if values.dtype == np.bool_:  # Arrow booleans are bit-packed, keep one byte per event to read them zero-copy
+        values = values.view(np.uint8)
+    return pa.array(values)
+
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _record_batch(samples, labels, layout: str) -> pa.RecordBatch:
+    offsets = np.zeros(len(samples) + 1, dtype=np.int64)
+    np.cumsum([len(sample) for sample in samples], out=offsets[1:])
+    events = np.concatenate([np.asarray(sample).view(np.ndarray) for sample in samples])
+    offsets = pa.array(offsets)
+
+    fields = {name: _to_arrow_values(np.ascontiguousarray(events[name])) for name in events.dtype.names}
+    if layout == "struct":
+        struct = pa.StructArray.from_arrays(list(fields.values()), list(fields))
+        columns = {_EVENTS_COLUMN: pa.LargeListArray.from_arrays(offsets, struct)}
+    else:
+        columns = {name: pa.LargeListArray.from_arrays(offsets, values) for name, values in fields.items()}
+
+    columns[_LABEL_COLUMN] = pa.array([_to_python(label) for label in labels])
+    for name in _METADATA_COLUMNS:
+        if all(getattr(sample, name, None) is not None for sample in samples):
+            columns[name] = pa.array([_to_python(getattr(sample, name)) for sample in samples])
+
+    return pa.RecordBatch.from_arrays(list(columns.values()), list(columns))
+
+
+def export_arrow(dataset, path: str, layout: str = "struct", batch_size: int = 1024, verbose: bool = True):
+    """Write every sample of a dataset to an Arrow IPC file
+
+    Arguments:
+        dataset -- Dataset returning (sparse spike train, label) tuples, where spike trains are record arrays
+        path {str} -- Output file (.arrow or .feather)
+
+    Keyword Arguments:
+        layout {str} -- "struct" for a list<struct> events column, "columns" for one list column per field
+        (default: {"struct"})
+        batch_size {int} -- Number of samples per Arrow record batch (default: {1024})
+        verbose {bool} -- Show a progress bar (default: {True})
+    """
+    from tqdm import tqdm
+
+    assert layout in ("struct", "columns"), "Unknown layout %s" % layout
+
+    writer, schema = None, None
+    samples, labels = [], []
+    try:
+        for i in tqdm(range(len(dataset)), desc="Exporting to %s" % path, disable=not verbose):
+            sample, label = dataset[i]
+            samples.append(sample)
+            labels.append(label)
+            if len(samples) == batch_size or i == len(dataset) - 1:
+                batch = _record_batch(samples, labels, layout)
+                if writer is None:
+                    schema = batch.schema.with_metadata(
+                        {
+                            "ebdataset.layout": layout,
+                            "ebdataset.dtype": json.dumps(np.asarray(sample).dtype.descr),
+                        }
+                    )
+                    writer = pa.ipc.new_file(path, schema)
+                writer.write_batch(pa.RecordBatch.from_arrays(batch.columns, schema=schema))
+                samples, labels = [], []
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+class ArrowDataset(data.Dataset):
+    """Read a file written by export_arrow through memory mapping
+
+    No event is read at construction, the file is memory-mapped once per process and
+    the event fields of a sample are zero-copy views on the mapped buffers (see columns).
+    __getitem__ packs these views in a record array, DVSSpikeTrain for samples having x, y, p and ts fields.
+    """
+
+    def __init__(self, path: str, transforms=None):
+        assert os.path.exists(path), "File %s doesn't exist" % path
+        self.path = path
+        self.transforms = transforms
+        self._batches = None
+        self._pid = None
+        self._open()
+
+    def _open(self):
+        if self._batches is not None and self._pid == os.getpid():
+            return
+
+        reader = pa.ipc.open_file(pa.memory_map(self.path, "r"))
+        metadata = reader.schema.metadata or {}
+        self._layout = metadata.get(b"ebdataset.layout", b"columns").decode()
+        self._dtype = np.dtype([tuple(field) for field in json.loads(metadata[b"ebdataset.dtype"])])
+        self._batches = [reader.get_batch(i) for i in range(reader.num_record_batches)]
+        self._batch_starts = np.cumsum([0] + [batch.num_rows for batch in self._batches])
+        self._pid = os.getpid()
+
+    def __getstate__(self):  # Every worker maps the file itself
+        state = self.__dict__.copy()
+        state["_batches"] = None
+        state["_pid"] = None
+        return state
+
+    def _locate(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Index %i out of range" % index)
+        batch_id = np.searchsorted(self._batch_starts, index, side="right") - 1
+        return self._batches[batch_id], index - self._batch_starts[batch_id]
+
+    def columns(self, index) -> dict:
+        """Zero-copy views on the event fields of a sample
+
+        Returns:
+            dict -- field name => np.ndarray (read-only)
+        """
+        self._open()
+        batch, row = self._locate(index)
+        if self._layout == "struct":
+            events = batch.column(_EVENTS_COLUMN)
+            values = {name: events.values.field(name) for name in self._dtype.names}
+        else:
+            events = batch.column(self._dtype.names[0])
+            values = {name: batch.column(name).values for name in self._dtype.names}
+
+        offsets = events.offsets.to_numpy(zero_copy_only=True)
+        start, end = offsets[row], offsets[row + 1]
+        return {
+            name: array.to_numpy(zero_copy_only=True)[start:end].view(self._dtype[name])
+            for name, array in values.items()
+        }
+
+    def __len__(self):
+        self._open()
+        return int(self._batch_starts[-1])
+
+    def __getitem__(self, index):
+        columns = self.columns(index)
+        batch, row = self._locate(index)
+
+        nb_events = len(next(iter(columns.values())))
+        if set(self._dtype.names) == {"x", "y", "p", "ts"}:
+            spike_train = DVSSpikeTrain(nb_events)
+            for name in _METADATA_COLUMNS:
+                if name in batch.schema.names:
+                    setattr(spike_train, name, batch.column(name)[row].as_py())
+        else:
+            spike_train = np.recarray(nb_events, dtype=self._dtype)
+        for name, values in columns.items():
+            spike_train[name] = values
+
+        if self.transforms is not None:
+            spike_train = self.transforms(spike_train)
+
+        return spike_train, batch.column(_LABEL_COLUMN)[row].as_py()
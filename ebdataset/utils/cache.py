@@ -0,0 +1,291 @@
+"""Content-addressed on-disk memoization of deterministic transforms
+
+Cached outputs are keyed by the identity of the sample (dataset key and index) and by transform_hash,
+a stable hash of the parameters of the transform pipeline. Changing a parameter changes the key,
+so stale entries are never read and age out of the store through its LRU eviction.
+
+Usage:
+    dataset = CachedTransforms(NMnist(path), Compose([ScaleDown(34, 34, 2), ToDense(1 * ms)]), "/scratch/cache")
+"""
+import copy
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import types
+import zlib
+import numpy as np
+from torch.utils import data
+
+_HASH_VERSION = 2
+_EXTENSION = ".pkl"
+_EVICTION_TARGET = 0.9  # Evict down to 90% of the size cap, so that eviction doesn't run on every write
+_SCALAR_TYPES = (str, bytes, bool, int, float, type(None), np.generic)
+_NOT_IDENTITY = ("transforms", "_shared")  # Dataset attributes that don't change which samples are read
+
+
+def _code_digest(code: types.CodeType) -> str:
+    """Hash of the bytecode of a function, of its constants (nested functions included) and of the names it uses"""
+    consts = tuple(_code_digest(const) if isinstance(const, types.CodeType) else const for const in code.co_consts)
+    description = "%s:%s:%s" % (code.co_code.hex(), _describe(consts, frozenset()), code.co_names)
+    return hashlib.sha1(description.encode("utf-8")).hexdigest()
+
+
+def _cell_contents(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:  # Cell of a variable not assigned yet
+        return "<empty cell>"
+
+
+def _describe(obj, seen: set) -> str:
+    """Canonical description of an object and of its parameters, stable across processes and sessions"""
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        return repr(obj)
+    if isinstance(obj, np.generic):
+        return "%s(%r)" % (obj.dtype.str, obj.item())
+    if isinstance(obj, np.ndarray) and obj.dtype == object:  # Pointers, described through their elements
+        return "ndarray(object, %s, %s)" % (obj.shape, _describe(obj.ravel().tolist(), seen))
+    if isinstance(obj, np.ndarray):
+        digest = hashlib.sha1(np.ascontiguousarray(obj).view(np.uint8).tobytes()).hexdigest()
+        return "ndarray(%s, %s, %s)" % (obj.dtype.str, obj.shape, digest)
+    if hasattr(obj, "detach") and hasattr(obj, "numpy"):  # torch tensors
+        return _describe(obj.detach().cpu().numpy(), seen)
+    if hasattr(obj, "magnitude") and hasattr(obj, "units"):  # pint quantities
+        return "Quantity(%s, %s)" % (_describe(obj.magnitude, seen), obj.units)
+    if isinstance(obj, (list, tuple)):
+        return "%s[%s]" % (type(obj).__name__, ", ".join(_describe(item, seen) for item in obj))
+    if isinstance(obj, (set, frozenset)):
+        return "set[%s]" % ", ".join(sorted(_describe(item, seen) for item in obj))
+    if isinstance(obj, dict):
+        items = sorted("%s: %s" % (_describe(key, seen), _describe(value, seen)) for key, value in obj.items())
+        return "dict{%s}" % ", ".join(items)
+    if isinstance(obj, functools.partial):
+        return "partial(%s, %s, %s)" % tuple(_describe(part, seen) for part in (obj.func, obj.args, obj.keywords))
+    if isinstance(obj, types.MethodType):
+        return "%s.%s" % (_describe(obj.__self__, seen), obj.__func__.__name__)
+    if isinstance(obj, types.FunctionType):  # Closures of a same factory only differ by their cells and defaults
+        name = "%s.%s" % (obj.__module__, obj.__qualname__)
+        if id(obj) in seen:
+            return name
+        seen = seen | {id(obj)}
+        cells = tuple(_cell_contents(cell) for cell in obj.__closure__ or ())
+        parameters = (_code_digest(obj.__code__), obj.__defaults__, obj.__kwdefaults__, cells)
+        return "function(%s, %s)" % (name, _describe(parameters, seen))
+    if isinstance(obj, types.ModuleType):
+        return "module(%s)" % obj.__name__
+    if isinstance(obj, (type, types.BuiltinFunctionType)):
+        return "%s.%s" % (getattr(obj, "__module__", None), obj.__qualname__)
+
+    name = "%s.%s" % (type(obj).__module__, type(obj).__qualname__)
+    if id(obj) in seen or not hasattr(obj, "__dict__"):
+        return name
+    seen = seen | {id(obj)}
+    volatile = getattr(obj, "_volatile_attributes", ())
+    parameters = {key: value for key, value in vars(obj).items() if key not in volatile}
+    return "%s(%s)" % (name, _describe(parameters, seen))
+
+
+def transform_hash(transform) -> str:
+    """Stable hash of a transform pipeline and of all its parameters
+
+    Objects are described by their class and attributes, recursively (e.g. the transforms of a Compose),
+    arrays by their content, functions by their code, defaults and closure cells. Attributes listed in the
+    _volatile_attributes of a class, such as counters, are ignored.
+
+    Returns:
+        str -- Hexadecimal sha1 digest
+    """
+    description = "v%i:%s" % (_HASH_VERSION, _describe(transform, frozenset()))
+    return hashlib.sha1(description.encode("utf-8")).hexdigest()
+
+
+def _dataset_identity(dataset) -> str:
+    """Description of the samples a dataset reads: its class, length and the attributes locating its data
+
+    Paths, splits and flags, file lists and index arrays (by content) are used, along with the identity of
+    wrapped datasets (e.g. the dataset of a Subset) and the path of archive readers.
+    """
+    parameters = {"length": len(dataset)}
+    for key, value in vars(dataset).items():
+        if key in _NOT_IDENTITY:
+            continue
+        if isinstance(value, str) and os.path.exists(value):
+            parameters[key] = os.path.realpath(value)
+        elif isinstance(value, _SCALAR_TYPES) or (isinstance(value, np.ndarray) and value.dtype != object):
+            parameters[key] = value
+        elif isinstance(value, (list, tuple)) and all(isinstance(item, _SCALAR_TYPES) for item in value):
+            parameters[key] = value
+        elif isinstance(value, data.Dataset):
+            parameters[key] = _dataset_identity(value)
+        elif isinstance(getattr(value, "path", None), str):  # Archive readers
+            parameters[key] = os.path.realpath(value.path)
+    return "%s.%s(%s)" % (type(dataset).__module__, type(dataset).__qualname__, _describe(parameters, frozenset()))
+
+
+class DiskCache(object):
+    """Directory of pickled values keyed by hexadecimal strings, with a size cap and LRU eviction
+
+    Writes are atomic (temporary file then rename), so several processes can share the same directory.
+    Reads refresh the modification time of the entry, the least recently used entries are evicted
+    once the cache grows over max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = None, compress: bool = False):
+        """
+        Arguments:
+            directory {str} -- Directory of the cache, created if needed
+
+        Keyword Arguments:
+            max_bytes {int} -- Size cap of the cache, unbounded if None (default: {None})
+            compress {bool} -- Compress the entries with zlib (default: {False})
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self._size = None  # Estimate of the size of the cache, refreshed when evicting
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + _EXTENSION)
+
+    def _entries(self) -> list:
+        entries = []
+        for sub_directory in os.scandir(self.directory):
+            if not sub_directory.is_dir():
+                continue
+            for entry in os.scandir(sub_directory.path):
+                if entry.name.endswith(_EXTENSION):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:  # Evicted by another process
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    @property
+    def size(self) -> int:
+        """Total size of the entries in bytes"""
+        return sum(size for _, size, _ in self._entries())
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return default
+        return pickle.loads(zlib.decompress(payload) if self.compress else payload)
+
+    def put(self, key: str, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.compress:
+            payload = zlib.compress(payload, 1)
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        if self.max_bytes is not None:
+            self._size = (self.size if self._size is None else self._size) + len(payload)
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is back under its size cap"""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * _EVICTION_TARGET if self.max_bytes is not None else self._size
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._size = 0
+
+
+class CachedTransforms(data.Dataset):
+    """Dataset wrapper memoizing the output of deterministic transforms on disk
+
+    The (transformed sample, label) of an index is computed once and read back from the cache afterwards,
+    without reading the sample from the dataset. Only cache deterministic transforms: random augmentations
+    would be frozen to their first draw. Entries are keyed by the data the dataset reads (see dataset_key),
+    so datasets of the same class at other paths, on other splits or subsets never share entries.
+    """
+
+    def __init__(
+        self,
+        dataset,
+        transforms=None,
+        directory: str = None,
+        max_bytes: int = None,
+        compress: bool = False,
+        dataset_key: str = None,
+    ):
+        """
+        Arguments:
+            dataset -- Map-style dataset returning (sparse spike train, label) tuples
+
+        Keyword Arguments:
+            transforms -- Transforms to cache. If None, the transforms of the dataset are used, and the raw
+            samples are read from a shallow copy of the dataset without transforms (default: {None})
+            directory {str} -- Directory of the cache (default: {None}, a directory in the system temporary folder)
+            max_bytes {int} -- Size cap of the cache, unbounded if None (default: {None})
+            compress {bool} -- Compress the entries with zlib (default: {False})
+            dataset_key {str} -- Identity of the dataset in the cache (default: {None}, a hash of the class,
+            length, paths, split and file list of the dataset)
+        """
+        self.dataset = dataset
+        if transforms is None:
+            transforms = getattr(dataset, "transforms", None)
+            if transforms is not None:  # Read the raw samples without modifying the dataset of the caller
+                self.dataset = copy.copy(dataset)
+                self.dataset.transforms = None
+        assert transforms is not None, "Nothing to cache, no transforms given"
+
+        self.transforms = transforms
+        self.dataset_key = dataset_key or hashlib.sha1(_dataset_identity(dataset).encode("utf-8")).hexdigest()
+        self.transforms_hash = transform_hash(transforms)
+        self.cache = DiskCache(
+            directory or os.path.join(tempfile.gettempdir(), "ebdataset_cache"), max_bytes=max_bytes, compress=compress
+        )
+
+    def _key(self, index) -> str:
+        identity = "%s:%s:%i" % (self.dataset_key, self.transforms_hash, index)
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        key = self._key(index)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        sample, label = self.dataset[index]
+        value = (self.transforms(sample), label)
+        self.cache.put(key, value)
+        return value
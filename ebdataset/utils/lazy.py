@@ -0,0 +1,32 @@
+import importlib
+
+
+def lazy_attributes(package: str, attributes: dict, submodules=()):
+    """Create module-level __getattr__ and __dir__ functions importing attributes on first access
+
+    Arguments:
+        package {str} -- Name of the package exposing the attributes (usually __name__)
+        attributes {dict} -- Mapping of attribute name to the (relative) module defining it
+
+    Keyword Arguments:
+        submodules {tuple} -- Names of the (relative) submodules to import lazily (default: {()})
+
+    Returns:
+        tuple -- (__getattr__, __dir__) to be assigned in the package namespace
+    """
+    namespace = importlib.import_module(package).__dict__
+
+    def __getattr__(name):
+        if name in submodules:
+            value = importlib.import_module("." + name, package)
+        elif name in attributes:
+            value = getattr(importlib.import_module(attributes[name], package), name)
+        else:
+            raise AttributeError("module %r has no attribute %r" % (package, name))
+        namespace[name] = value  # Cache it, next lookups won't go through __getattr__
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(attributes) | set(submodules))
+
+    return __getattr__, __dir__
@@ -0,0 +1,189 @@
+"""Per-sample metadata of a dataset, computed once and queried without decoding any event
+
+Usage:
+    index = MetadataIndex.for_dataset(dataset, "/data/DvsGesture/train.meta.npz")
+    long_samples = index.subset(dataset, events=(10000, None), duration=(None, 1e6))
+"""
+import os
+import numpy as np
+from torch.utils import data
+from .parallel import bounded_map
+
+_dtype = np.dtype(
+    [
+        ("events", np.int64),
+        ("duration", np.float64),  # In timestamp units, the duration attribute of the sample when it has one
+        ("ts_min", np.float64),
+        ("ts_max", np.float64),
+        ("x_min", np.int64),  # Bounding box, -1 for empty samples or samples without x / y fields
+        ("x_max", np.int64),
+        ("y_min", np.int64),
+        ("y_max", np.int64),
+        ("on_ratio", np.float64),  # Fraction of ON events, nan for samples without polarity
+        ("time_scale", np.float64),  # Duration of a timestamp unit in seconds, nan when unknown
+    ]
+)
+_LABELS = "label"
+_CHUNK_SIZE = 64
+
+
+def _sample_metadata(spike_train) -> tuple:
+    names = spike_train.dtype.names
+    count = len(spike_train)
+    row = np.full(1, -1, dtype=_dtype)[0]
+    row["events"] = count
+    row["on_ratio"] = np.nan
+    row["time_scale"] = getattr(spike_train, "time_scale", None) or np.nan
+
+    if count > 0:
+        ts = spike_train.ts
+        row["ts_min"], row["ts_max"] = ts.min(), ts.max()
+        if "x" in names and "y" in names:
+            row["x_min"], row["x_max"] = spike_train.x.min(), spike_train.x.max()
+            row["y_min"], row["y_max"] = spike_train.y.min(), spike_train.y.max()
+        if "p" in names:
+            row["on_ratio"] = np.count_nonzero(spike_train.p) / count
+
+    duration = getattr(spike_train, "duration", None)
+    if duration is None or duration < 0:
+        duration = row["ts_max"] + 1 if count > 0 else 0
+    row["duration"] = duration
+    return row
+
+
+def _chunk_metadata(args):
+    dataset, indices = args
+    rows = np.zeros(len(indices), dtype=_dtype)
+    labels = []
+    for i, index in enumerate(indices):
+        spike_train, label = dataset[index]
+        rows[i] = _sample_metadata(spike_train)
+        labels.append(label)
+    return rows, labels
+
+
+class MetadataIndex(object):
+    """Event count, duration, min / max timestamps, bounding box, polarity balance and label of every sample
+
+    Columns are accessed with index["events"], index["duration"], ..., index["label"].
+    The index is built by decoding every sample once (without the dataset transforms) and saved to a .npz file,
+    then queries select samples with array operations only.
+    """
+
+    def __init__(self, table: np.ndarray, labels):
+        self.table = table
+        self.labels = np.asarray(labels)
+
+    @classmethod
+    def build(cls, dataset, verbose: bool = True, num_workers: int = 0):
+        """Decode every sample of a dataset to collect its metadata
+
+        Arguments:
+            dataset -- Map-style dataset returning (sparse spike train, label) tuples
+
+        Keyword Arguments:
+            verbose {bool} -- Show a progress bar (default: {True})
+            num_workers {int} -- Number of processes decoding the samples (default: {0})
+        """
+        from tqdm import tqdm
+
+        transforms = getattr(dataset, "transforms", None)
+        table = np.zeros(len(dataset), dtype=_dtype)
+        labels = []
+        try:
+            if transforms is not None:
+                dataset.transforms = None
+            chunks = [
+                range(start, min(start + _CHUNK_SIZE, len(dataset))) for start in range(0, len(dataset), _CHUNK_SIZE)
+            ]
+            with tqdm(total=len(dataset), desc="Indexing metadata", disable=not verbose) as progress:
+                results = bounded_map(_chunk_metadata, ((dataset, chunk) for chunk in chunks), num_workers)
+                for chunk, (rows, chunk_labels) in zip(chunks, results):
+                    table[chunk.start : chunk.stop] = rows
+                    labels += chunk_labels
+                    progress.update(len(chunk))
+        finally:
+            if transforms is not None:
+                dataset.transforms = transforms
+        return cls(table, labels)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as stored:
+            table = np.zeros(stored[_LABELS].size, dtype=_dtype)
+            for name in _dtype.names:
+                table[name] = stored[name]
+            return cls(table, stored[_LABELS])
+
+    def save(self, path: str):
+        """Save the index to a .npz file, written to a temporary file first so that readers never see a partial index"""
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **{name: self.table[name] for name in _dtype.names}, **{_LABELS: self.labels})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def for_dataset(cls, dataset, path: str = None, verbose: bool = True, num_workers: int = 0):
+        """Load the index of a dataset from path, or build it and save it there
+
+        The stored index is rebuilt when its number of samples doesn't match the dataset.
+
+        Arguments:
+            dataset -- Map-style dataset returning (sparse spike train, label) tuples
+
+        Keyword Arguments:
+            path {str} -- .npz file of the index, typically next to the dataset files (default: {None})
+            verbose {bool} -- Show a progress bar (default: {True})
+            num_workers {int} -- Number of processes decoding the samples (default: {0})
+        """
+        if path is not None and os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if len(index) == len(dataset):
+                    return index
+            except KeyError:  # Older or foreign file, rebuild it
+                pass
+
+        index = cls.build(dataset, verbose=verbose, num_workers=num_workers)
+        if path is not None:
+            index.save(path)
+        return index
+
+    def __len__(self):
+        return self.table.size
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.labels if name == _LABELS else self.table[name]
+
+    @property
+    def columns(self) -> tuple:
+        return _dtype.names + (_LABELS,)
+
+    def query(self, mask=None, label=None, **ranges) -> np.ndarray:
+        """Indices of the samples matching every condition
+
+        Keyword Arguments:
+            mask {array-like of bool or callable} -- Boolean mask over the samples,
+            or a function of the index returning one, e.g. lambda index: index["x_max"] < 64 (default: {None})
+            label {iterable} -- Accepted labels (default: {None})
+            ranges -- column=(low, high) inclusive bounds, None for an open bound, e.g. events=(10000, None)
+
+        Returns:
+            np.ndarray -- Indices of the selected samples, in increasing order
+        """
+        selected = np.ones(len(self), dtype=bool)
+        if mask is not None:
+            selected &= np.asarray(mask(self) if callable(mask) else mask, dtype=bool)
+        if label is not None:
+            selected &= np.isin(self.labels, np.asarray(list(label)))
+        for name, (low, high) in ranges.items():
+            assert name in _dtype.names, "Unknown column %s" % name
+            if low is not None:
+                selected &= self.table[name] >= low
+            if high is not None:
+                selected &= self.table[name] <= high
+        return np.flatnonzero(selected)
+
+    def subset(self, dataset, mask=None, label=None, **ranges) -> data.Subset:
+        """Subset of dataset with the samples matching every condition of query"""
+        assert len(dataset) == len(self), "The index doesn't match the dataset"
+        return data.Subset(dataset, self.query(mask, label, **ranges).tolist())
@@ -0,0 +1,35 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def bounded_map(fn, iterable, num_workers: int = 0, max_pending: int = None):
+    """Ordered map of fn over iterable across a process pool, without running too far ahead of the consumer
+
+    Unlike Executor.map, at most max_pending results are computed but not yet consumed,
+    which bounds memory when the results are large (e.g. decoded recordings).
+    The process pool is shut down once the generator is exhausted or closed.
+
+    Arguments:
+        fn {callable} -- Picklable function applied to every item
+        iterable {iterable} -- Items to process
+
+    Keyword Arguments:
+        num_workers {int} -- Number of processes, 0 runs everything in the calling process (default: {0})
+        max_pending {int} -- Maximum number of results in flight (default: {2 * num_workers})
+
+    Yields:
+        The results of fn, in the order of iterable
+    """
+    if num_workers <= 0:
+        yield from map(fn, iterable)
+        return
+
+    max_pending = max_pending or 2 * num_workers
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,287 @@
+"""Streaming pipelines for generator datasets: source -> decode -> window -> transform -> batch
+
+Each stage runs in its own thread, mapping its function over a thread or process pool, and stages are
+connected by bounded queues: a slow stage blocks the upstream ones instead of letting items pile up in memory.
+Per-stage counters tell which stage to scale.
+
+Usage:
+    pipeline = Pipeline(
+        files,
+        Stage(decode_and_window, num_workers=4, kind="process", flat=True, name="decode"),
+        Stage(transforms, num_workers=2, name="transform"),
+        Batch(32, collate_fn=collate_spike_trains),
+    )
+    for batch, labels in pipeline:
+        ...
+    print(pipeline.report())
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+_END = object()  # End of stream marker
+_POLL_INTERVAL = 0.1  # Seconds between checks of the stop flag while blocked on a queue
+
+
+class _Failure(object):
+    """Exception raised in a stage, forwarded downstream to the consumer"""
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def _timed_call(fn, item):
+    start = time.perf_counter()
+    result = fn(item)
+    return result, time.perf_counter() - start
+
+
+class StageCounters(object):
+    """Throughput counters of a stage, updated while the pipeline runs"""
+
+    def __init__(self, name: str, num_workers: int = 1):
+        self.name = name
+        self.num_workers = num_workers
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_time = 0.0  # Seconds spent in the stage function, summed over the workers
+        self.wait_time = 0.0  # Seconds spent waiting for input items
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.perf_counter()) - self.start_time
+
+    @property
+    def throughput(self) -> float:
+        """Output items per second"""
+        return self.items_out / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Fraction of the time the workers of the stage were busy, the slow stage is close to 1"""
+        return self.busy_time / (self.elapsed * self.num_workers) if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return "%s: %i in, %i out, %.1f items/s, %i workers %.0f%% busy, waited %.2fs for input" % (
+            self.name,
+            self.items_in,
+            self.items_out,
+            self.throughput,
+            self.num_workers,
+            100 * self.utilization,
+            self.wait_time,
+        )
+
+
+class Stage(object):
+    """Map fn over the stream with a pool of thread or process workers
+
+    Arguments of fn and its results cross process boundaries with kind="process", so they must be picklable.
+    """
+
+    def __init__(
+        self,
+        fn,
+        num_workers: int = 1,
+        kind: str = "thread",
+        ordered: bool = True,
+        flat: bool = False,
+        max_pending: int = None,
+        name: str = None,
+    ):
+        """
+        Arguments:
+            fn {callable} -- Function applied to every item
+
+        Keyword Arguments:
+            num_workers {int} -- Number of workers (default: {1})
+            kind {str} -- "thread" or "process" workers (default: {"thread"})
+            ordered {bool} -- Keep the input order, otherwise yield results as they complete (default: {True})
+            flat {bool} -- fn returns an iterable of items, e.g. the windows of a recording (default: {False})
+            max_pending {int} -- Maximum number of items being processed at once (default: {2 * num_workers})
+            name {str} -- Name of the stage in the counters (default: {name of fn})
+        """
+        assert kind in ("thread", "process"), "Unknown worker kind %s" % kind
+        self.fn = fn
+        self.num_workers = num_workers
+        self.kind = kind
+        self.ordered = ordered
+        self.flat = flat
+        self.max_pending = max_pending or 2 * num_workers
+        self.name = name or getattr(fn, "__name__", type(fn).__name__)
+
+    def run(self, items, counters: StageCounters):
+        """Generator of the outputs of the stage over the items"""
+        executor_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+        with executor_class(max_workers=self.num_workers) as executor:
+            pending = deque() if self.ordered else set()
+
+            def collect(future):
+                result, duration = future.result()
+                counters.busy_time += duration
+                results = result if self.flat else (result,)
+                for result in results:
+                    counters.items_out += 1
+                    yield result
+
+            for item in items:
+                counters.items_in += 1
+                future = executor.submit(_timed_call, self.fn, item)
+                if self.ordered:
+                    pending.append(future)
+                    if len(pending) >= self.max_pending:
+                        yield from collect(pending.popleft())
+                else:
+                    pending.add(future)
+                    if len(pending) >= self.max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from collect(future)
+
+            while pending:
+                if self.ordered:
+                    yield from collect(pending.popleft())
+                else:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from collect(future)
+
+
+class Batch(object):
+    """Group consecutive items in lists of batch_size items, optionally collated"""
+
+    def __init__(self, batch_size: int, collate_fn=None, drop_last: bool = False, name: str = "batch"):
+        self.batch_size = batch_size
+        self.collate_fn = collate_fn
+        self.drop_last = drop_last
+        self.name = name
+        self.num_workers = 1
+
+    def _emit(self, batch, counters: StageCounters):
+        start = time.perf_counter()
+        batch = batch if self.collate_fn is None else self.collate_fn(batch)
+        counters.busy_time += time.perf_counter() - start
+        counters.items_out += 1
+        return batch
+
+    def run(self, items, counters: StageCounters):
+        batch = []
+        for item in items:
+            counters.items_in += 1
+            batch.append(item)
+            if len(batch) == self.batch_size:
+                yield self._emit(batch, counters)
+                batch = []
+        if batch and not self.drop_last:
+            yield self._emit(batch, counters)
+
+
+class Pipeline(object):
+    """Run a source iterable through stages, each in its own thread, connected by bounded queues
+
+    Iterating the pipeline starts the stages, breaking out of the iteration stops them.
+    An exception raised in a stage is raised again in the consumer. Counters of the last run
+    are available with counters and report.
+    """
+
+    def __init__(self, source, *stages, queue_size: int = 8):
+        """
+        Arguments:
+            source {iterable} -- Items fed to the first stage, e.g. a list of files or a generator
+            stages -- Stage or Batch instances, applied in order
+
+        Keyword Arguments:
+            queue_size {int} -- Capacity of the queues between stages (default: {8})
+        """
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.counters = []
+
+    def _put(self, out_queue, item, stop):
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _input(self, in_queue, counters, stop):
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                item = in_queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                counters.wait_time += time.perf_counter() - start
+                continue
+            counters.wait_time += time.perf_counter() - start
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.exception
+            yield item
+
+    def _run_source(self, out_queue, counters, stop):
+        counters.start_time = time.perf_counter()
+        try:
+            for item in self.source:
+                counters.items_out += 1
+                if not self._put(out_queue, item, stop):
+                    return
+            self._put(out_queue, _END, stop)
+        except BaseException as exception:
+            self._put(out_queue, _Failure(exception), stop)
+        finally:
+            counters.end_time = time.perf_counter()
+
+    def _run_stage(self, stage, in_queue, out_queue, counters, stop):
+        counters.start_time = time.perf_counter()
+        outputs = stage.run(self._input(in_queue, counters, stop), counters)
+        try:
+            for item in outputs:
+                if not self._put(out_queue, item, stop):
+                    return
+            self._put(out_queue, _END, stop)
+        except BaseException as exception:
+            self._put(out_queue, _Failure(exception), stop)
+        finally:
+            outputs.close()  # Shuts the workers of the stage down when stopped early
+            counters.end_time = time.perf_counter()
+
+    def __iter__(self):
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        self.counters = [StageCounters("source")] + [
+            StageCounters(stage.name, stage.num_workers) for stage in self.stages
+        ]
+
+        threads = [threading.Thread(target=self._run_source, args=(queues[0], self.counters[0], stop), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            arguments = (stage, queues[i], queues[i + 1], self.counters[i + 1], stop)
+            threads.append(threading.Thread(target=self._run_stage, args=arguments, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.exception
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def report(self) -> str:
+        """Counters of every stage, one per line"""
+        return "\n".join(repr(counters) for counters in self.counters)
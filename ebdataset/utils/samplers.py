@@ -0,0 +1,226 @@
+"""Samplers tailored to the storage layout of event based datasets"""
+
+import numpy as np
+from .metadata import MetadataIndex
+from .sharding import EpochSampler, ShardedSampler
+
+
+class GroupedSampler(EpochSampler):
+    """Sample every index of a group (e.g. the windows of one recording) consecutively
+
+    The order of the groups and the order inside each group are shuffled every epoch,
+    so that a dataset caching its last decoded recordings decodes each of them once per epoch.
+    Call set_epoch at the start of every epoch to reshuffle.
+    """
+
+    def __init__(self, group_ids, shuffle: bool = True, seed: int = 0):
+        """
+        Arguments:
+            group_ids {array-like} -- Group of every sample of the dataset
+
+        Keyword Arguments:
+            shuffle {bool} -- Shuffle the groups and the samples inside groups (default: {True})
+            seed {int} -- Seed of the per-epoch shuffling (default: {0})
+        """
+        super().__init__(shuffle, seed)
+        self.group_ids = np.asarray(group_ids)
+
+    def __len__(self):
+        return self.group_ids.size
+
+    def __iter__(self):
+        groups, inverse = np.unique(self.group_ids, return_inverse=True)
+        if not self.shuffle:
+            return iter(np.argsort(inverse, kind="stable").tolist())
+
+        rand = self._random_state()
+        group_rank = rand.permutation(groups.size)[inverse]
+        within_group = rand.random_sample(self.group_ids.size)
+        return iter(np.lexsort((within_group, group_rank)).tolist())
+
+
+class BlockShuffleSampler(ShardedSampler):
+    """Locality-aware shuffling for datasets stored contiguously, e.g. converted h5 files or mmap caches
+
+    The indices are cut into blocks of block_size consecutive samples and the order of the blocks is shuffled,
+    so that reads stay sequential inside a block. The stream of blocks is then shuffled locally, every index
+    moving by less than buffer_size positions, which mixes samples of about buffer_size / block_size blocks.
+    Larger blocks give more sequential reads, a larger buffer gives more randomness.
+
+    With distributed training, every rank gets a contiguous slice of the shuffled blocks, of the same size
+    on every rank. Call set_epoch at the start of every epoch to reshuffle.
+    """
+
+    def __init__(
+        self,
+        dataset,
+        block_size: int = 64,
+        buffer_size: int = 1024,
+        shuffle: bool = True,
+        seed: int = 0,
+        drop_last: bool = False,
+        rank: int = None,
+        world_size: int = None,
+    ):
+        """
+        Arguments:
+            dataset -- Map-style dataset to sample from, indexed in storage order
+
+        Keyword Arguments:
+            block_size {int} -- Number of consecutive samples read together (default: {64})
+            buffer_size {int} -- Window of the local shuffle in indices, 0 to only shuffle the blocks (default: {1024})
+            shuffle {bool} -- Shuffle the blocks and the buffer every epoch, otherwise keep the storage order
+            (default: {True})
+            seed {int} -- Seed shared by all ranks (default: {0})
+            drop_last {bool} -- Drop the tail so every rank sees the same number of samples,
+            otherwise the tail is padded with samples from the start (default: {False})
+            rank {int} -- Override the distributed rank (default: {None})
+            world_size {int} -- Override the distributed world size (default: {None})
+        """
+        assert block_size > 0, "block_size must be positive"
+        super().__init__(dataset, shuffle, seed, drop_last, rank, world_size)
+        self.block_size = block_size
+        self.buffer_size = buffer_size
+
+    def _buffer_shuffle(self, indices: np.ndarray, rand: np.random.RandomState) -> np.ndarray:
+        """Sort the indices by their position jittered by up to buffer_size, so none moves further than that"""
+        if self.buffer_size <= 1 or indices.size <= 1:
+            return indices
+        keys = np.arange(indices.size) + rand.random_sample(indices.size) * self.buffer_size
+        return indices[np.argsort(keys)]
+
+    def __iter__(self):
+        indices = np.arange(self.length)
+        if self.shuffle:  # Same block order on every rank
+            nb_blocks = -(-self.length // self.block_size)
+            starts = self._random_state().permutation(nb_blocks) * self.block_size
+            indices = (starts[:, None] + np.arange(min(self.block_size, self.length))).ravel()
+            indices = indices[indices < self.length]  # The last block can be shorter
+
+        rank = self.shard.rank
+        indices = self._padded(indices)[rank * self.num_samples : (rank + 1) * self.num_samples]
+        if self.shuffle:
+            indices = self._buffer_shuffle(indices, self._random_state(self.shard))
+        return iter(indices.tolist())
+
+
+def event_statistics(dataset, cache_path: str = None, verbose: bool = True):
+    """Number of events and duration of every sample of a dataset, computed once and cached
+
+    The statistics are the events and duration columns of the dataset MetadataIndex,
+    computed without the dataset transforms so that they describe the sparse spike trains themselves.
+
+    Arguments:
+        dataset -- Map-style dataset returning (sparse spike train, label) tuples
+
+    Keyword Arguments:
+        cache_path {str} -- .npz file where the metadata index is persisted (default: {None})
+        verbose {bool} -- Show a progress bar (default: {True})
+
+    Returns:
+        tuple -- (event counts, durations) as np.ndarray
+    """
+    index = MetadataIndex.for_dataset(dataset, cache_path, verbose=verbose)
+    return index["events"], index["duration"]
+
+
+class BucketBatchSampler(EpochSampler):
+    """Batch sampler grouping samples of similar length to reduce padding
+
+    Every epoch, the samples are shuffled and split into pools of pool_size samples.
+    Each pool is sorted by length and cut into batches, then the order of all the batches is shuffled.
+    Smaller pools give more randomness, larger pools give less padding.
+
+    Batches are either of a fixed size or filled up to a budget of max_events padded events
+    (batch size x longest sample of the batch), or both.
+    """
+
+    def __init__(
+        self,
+        lengths,
+        batch_size: int = None,
+        max_events: int = None,
+        pool_size: int = 1000,
+        shuffle: bool = True,
+        seed: int = 0,
+        drop_last: bool = False,
+    ):
+        """
+        Arguments:
+            lengths {array-like} -- Length of every sample, e.g. the event counts or durations of event_statistics
+
+        Keyword Arguments:
+            batch_size {int} -- Maximum number of samples per batch (default: {None})
+            max_events {int} -- Maximum number of padded events per batch (default: {None})
+            pool_size {int} -- Number of samples sorted together (default: {1000})
+            shuffle {bool} -- Shuffle the samples and the batches every epoch (default: {True})
+            seed {int} -- Seed of the per-epoch shuffling (default: {0})
+            drop_last {bool} -- Drop the batches smaller than batch_size (default: {False})
+        """
+        assert batch_size is not None or max_events is not None, "Specify a batch_size, a max_events budget or both"
+        super().__init__(shuffle, seed)
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.max_events = max_events
+        self.pool_size = max(pool_size, batch_size or 1)
+        self.drop_last = drop_last
+        self._batches = None
+
+    @classmethod
+    def from_dataset(cls, dataset, cache_path: str = None, by: str = "events", **kwargs):
+        """Create the sampler from the event_statistics of a dataset
+
+        Arguments:
+            dataset -- Map-style dataset returning (sparse spike train, label) tuples
+
+        Keyword Arguments:
+            cache_path {str} -- .npz file where the statistics are persisted (default: {None})
+            by {str} -- Bucket the samples by "events" count or by "duration" (default: {"events"})
+        """
+        events, durations = event_statistics(dataset, cache_path)
+        return cls({"events": events, "duration": durations}[by], **kwargs)
+
+    def set_epoch(self, epoch: int):
+        super().set_epoch(epoch)
+        self._batches = None
+
+    def _split_pool(self, pool):
+        if self.max_events is None:
+            return [pool[i : i + self.batch_size] for i in range(0, pool.size, self.batch_size)]
+
+        batches = []
+        start = 0
+        for end in range(1, pool.size + 1):  # Pool is sorted, the last sample is the longest of the batch
+            too_many = self.batch_size is not None and end - start > self.batch_size
+            if end - start > 1 and (too_many or (end - start) * self.lengths[pool[end - 1]] > self.max_events):
+                batches.append(pool[start : end - 1])
+                start = end - 1
+        batches.append(pool[start:])
+        return batches
+
+    def _create_batches(self):
+        rand = self._random_state()
+        indices = rand.permutation(self.lengths.size) if self.shuffle else np.arange(self.lengths.size)
+
+        batches = []
+        for start in range(0, indices.size, self.pool_size):
+            pool = indices[start : start + self.pool_size]
+            pool = pool[np.argsort(self.lengths[pool], kind="stable")]
+            batches += self._split_pool(pool)
+
+        if self.drop_last and self.batch_size is not None:
+            batches = [batch for batch in batches if batch.size == self.batch_size]
+        if self.shuffle:
+            batches = [batches[i] for i in rand.permutation(len(batches))]
+        return batches
+
+    def __len__(self):
+        if self._batches is None:
+            self._batches = self._create_batches()
+        return len(self._batches)
+
+    def __iter__(self):
+        if self._batches is None:
+            self._batches = self._create_batches()
+        batches, self._batches = self._batches, None
+        return (batch.tolist() for batch in batches)
@@ -0,0 +1,189 @@
+"""Deterministic partitioning of datasets across distributed ranks and DataLoader workers
+
+Every (rank, worker) pair is a shard. Work is split per epoch with a permutation
+seeded by (seed, epoch), so every shard agrees on the partition without communicating.
+"""
+import os
+from collections import namedtuple
+import numpy as np
+from torch.utils import data
+
+
+class ShardInfo(namedtuple("ShardInfo", ["rank", "world_size", "worker_id", "num_workers"])):
+    """Position of the current process among distributed ranks and DataLoader workers"""
+
+    __slots__ = ()
+
+    @property
+    def index(self) -> int:
+        """Global index of this shard in [0, count)"""
+        return self.rank * self.num_workers + self.worker_id
+
+    @property
+    def count(self) -> int:
+        """Total number of shards"""
+        return self.world_size * self.num_workers
+
+
+def get_distributed_info():
+    """Return (rank, world_size) from torch.distributed when initialized, or from the RANK / WORLD_SIZE
+    environment variables set by torchrun, defaulting to a single process"""
+    import torch.distributed as dist
+
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_rank(), dist.get_world_size()
+    return int(os.environ.get("RANK", 0)), int(os.environ.get("WORLD_SIZE", 1))
+
+
+def get_shard_info(rank: int = None, world_size: int = None) -> ShardInfo:
+    """Find the shard of the calling process
+
+    Keyword Arguments:
+        rank {int} -- Override the distributed rank (default: {None})
+        world_size {int} -- Override the distributed world size (default: {None})
+
+    Returns:
+        ShardInfo -- (rank, world_size, worker_id, num_workers)
+    """
+    if rank is None or world_size is None:
+        dist_rank, dist_world_size = get_distributed_info()
+        rank = dist_rank if rank is None else rank
+        world_size = dist_world_size if world_size is None else world_size
+    assert 0 <= rank < world_size, "Invalid rank %i for world size %i" % (rank, world_size)
+
+    worker_info = data.get_worker_info()
+    if worker_info is None:
+        return ShardInfo(rank, world_size, 0, 1)
+    return ShardInfo(rank, world_size, worker_info.id, worker_info.num_workers)
+
+
+def shard_seed(seed: int, epoch: int, shard: ShardInfo = None) -> list:
+    """Seed for np.random.RandomState that is unique per (seed, epoch, shard)"""
+    if shard is None:
+        return [seed, epoch]
+    return [seed, epoch, shard.index, shard.count]
+
+
+def shard_indices(length: int, shard: ShardInfo, epoch: int = 0, seed: int = 0, shuffle: bool = True) -> np.ndarray:
+    """Indices of the samples belonging to a shard for a given epoch
+
+    Samples are permuted with a (seed, epoch)-seeded generator, identical on every shard,
+    then dealt round-robin so that shards are disjoint and their sizes differ by at most one.
+
+    Arguments:
+        length {int} -- Number of samples in the dataset
+        shard {ShardInfo} -- Shard to select, see get_shard_info
+
+    Keyword Arguments:
+        epoch {int} -- Current epoch (default: {0})
+        seed {int} -- Seed shared by all shards (default: {0})
+        shuffle {bool} -- Permute the samples before sharding (default: {True})
+
+    Returns:
+        np.ndarray -- Sample indices of the shard
+    """
+    indices = np.arange(length)
+    if shuffle:
+        np.random.RandomState(seed=shard_seed(seed, epoch)).shuffle(indices)
+    return indices[shard.index :: shard.count]
+
+
+class EpochSampler(data.Sampler):
+    """Base of the samplers reshuffled every epoch with a generator seeded by (seed, epoch)
+
+    Call set_epoch at the start of every epoch to reshuffle.
+    """
+
+    def __init__(self, shuffle: bool = True, seed: int = 0):
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def _random_state(self, shard: ShardInfo = None) -> np.random.RandomState:
+        """Generator of the current epoch, identical on every shard unless shard is given"""
+        return np.random.RandomState(seed=shard_seed(self.seed, self.epoch, shard))
+
+
+class ShardedSampler(EpochSampler):
+    """Sampler for map-style datasets giving each distributed rank a disjoint part of the dataset
+
+    DataLoader workers already split the batches of a sampler among themselves, so only the
+    distributed rank is used here. Call set_epoch at the start of every epoch to reshuffle.
+    """
+
+    def __init__(
+        self,
+        dataset,
+        shuffle: bool = True,
+        seed: int = 0,
+        drop_last: bool = False,
+        rank: int = None,
+        world_size: int = None,
+    ):
+        """
+        Arguments:
+            dataset -- Map-style dataset to sample from
+
+        Keyword Arguments:
+            shuffle {bool} -- Permute the samples every epoch (default: {True})
+            seed {int} -- Seed shared by all ranks (default: {0})
+            drop_last {bool} -- Drop the tail so every rank sees the same number of samples,
+            otherwise the tail is padded with samples from the start (default: {False})
+            rank {int} -- Override the distributed rank (default: {None})
+            world_size {int} -- Override the distributed world size (default: {None})
+        """
+        super().__init__(shuffle, seed)
+        self.length = len(dataset)
+        self.drop_last = drop_last
+        dist_rank, dist_world_size = get_distributed_info()
+        self.shard = ShardInfo(
+            dist_rank if rank is None else rank, dist_world_size if world_size is None else world_size, 0, 1
+        )
+
+        if drop_last:
+            self.num_samples = self.length // self.shard.world_size
+        else:
+            self.num_samples = -(-self.length // self.shard.world_size)
+
+    def __len__(self):
+        return self.num_samples
+
+    def _padded(self, indices: np.ndarray) -> np.ndarray:
+        """indices padded with their start or cut, to num_samples for every rank"""
+        total_size = self.num_samples * self.shard.world_size
+        if total_size > indices.size:  # Pad so that every rank gets the same number of samples
+            indices = np.resize(indices, total_size)
+        return indices[:total_size]
+
+    def __iter__(self):
+        indices = np.arange(self.length)
+        if self.shuffle:
+            self._random_state().shuffle(indices)
+        return iter(self._padded(indices)[self.shard.rank :: self.shard.world_size].tolist())
+
+
+class ShardedIterableDataset(data.IterableDataset):
+    """Iterate over the shard of a map-style dataset belonging to the current (rank, worker)
+
+    Useful to stream a map-style dataset with an IterableDataset-based pipeline while
+    guaranteeing that no sample is produced twice across ranks and DataLoader workers.
+    """
+
+    def __init__(self, dataset, shuffle: bool = True, seed: int = 0, rank: int = None, world_size: int = None):
+        self.dataset = dataset
+        self.shuffle = shuffle
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __iter__(self):
+        shard = get_shard_info(self.rank, self.world_size)
+        for index in shard_indices(len(self.dataset), shard, self.epoch, self.seed, self.shuffle):
+            yield self.dataset[index]
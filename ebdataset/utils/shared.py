@@ -0,0 +1,160 @@
+"""Whole-split preloading in POSIX shared memory
+
+The events of every sample are decoded into a single record array placed in shared memory,
+with an offsets vector delimiting the samples. Pickling a SharedEvents only sends the name of the
+shared memory block, so DataLoader workers attach to it without copying the block and memory use doesn't
+depend on the number of workers.
+"""
+import os
+import sys
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+_ATTRIBUTES = ("width", "height", "duration", "time_scale")
+_LOAD_MANY_SIZE = 64  # Samples decoded per call of a batch decoder
+
+
+def _attach(name: str, owner: int) -> shared_memory.SharedMemory:
+    if os.getppid() == owner:  # Workers share the resource tracker of the owner, attach normally
+        return shared_memory.SharedMemory(name=name)
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Unrelated process: its own resource tracker would unlink the block when the process exits
+    shm = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedEvents(object):
+    """Events and labels of every sample of a split, stored in shared memory
+
+    shared[index] returns (spike train, label) where the spike train is a read-only view of the shared events,
+    of the same type and with the same width / height / duration / time_scale attributes as the decoded sample.
+    No event is copied: transforms return new spike trains, a transform modifying its input in place must copy it.
+    The shared memory block is released when the SharedEvents of the creating process is closed or collected.
+    """
+
+    def __init__(self, events: np.ndarray, offsets, labels, attributes: dict = None, sample_type=np.recarray):
+        """
+        Arguments:
+            events {np.ndarray} -- Structured array of the events of every sample, one after the other
+            offsets {array-like} -- The events of sample i are events[offsets[i]:offsets[i + 1]]
+            labels {array-like} -- Label of every sample
+
+        Keyword Arguments:
+            attributes {dict} -- Attribute name => value of every sample (default: {None})
+            sample_type {type} -- Record array type of the returned samples (default: {np.recarray})
+        """
+        self._allocate(events.dtype, offsets, labels, attributes, sample_type)
+        self._events.setflags(write=True)
+        self._events[:] = events
+        self._events.setflags(write=False)
+
+    def _allocate(self, dtype, offsets, labels, attributes, sample_type):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.labels = np.asarray(labels)
+        self.attributes = attributes or {}
+        self.sample_type = sample_type
+        self._dtype = np.dtype(dtype)
+        self._count = int(self.offsets[-1])
+        self._owner = os.getpid()
+        self._shm = shared_memory.SharedMemory(create=True, size=max(self._count * self._dtype.itemsize, 1))
+        self._map()
+
+    @classmethod
+    def from_loader(cls, load, length: int, verbose: bool = False, load_many=None):
+        """Decode every sample once and copy them to shared memory
+
+        The size of the shared memory block is only known once every sample is decoded, so the decoded samples
+        are kept until then, and each of them is released as soon as it is copied to the block.
+
+        Arguments:
+            load {callable} -- Function of the index returning a (sparse spike train, label) tuple
+            length {int} -- Number of samples
+
+        Keyword Arguments:
+            verbose {bool} -- Show a progress bar (default: {False})
+            load_many {callable} -- Function of a list of indices returning their (sparse spike train, label)
+            tuples, e.g. a batch decoder, used instead of load when given (default: {None})
+        """
+        from tqdm import tqdm
+
+        samples = []
+        labels = []
+        values = {name: [] for name in _ATTRIBUTES}
+        dtype, sample_type = np.dtype([]), np.recarray
+        with tqdm(total=length, desc="Preloading to shared memory", disable=not verbose) as progress:
+            for start in range(0, length, _LOAD_MANY_SIZE if load_many is not None else 1):
+                if load_many is not None:
+                    decoded = load_many(list(range(start, min(start + _LOAD_MANY_SIZE, length))))
+                else:
+                    decoded = [load(start)]
+                for spike_train, label in decoded:
+                    samples.append(np.asarray(spike_train))
+                    labels.append(label)
+                    for name in _ATTRIBUTES:
+                        values[name].append(getattr(spike_train, name, None))
+                    dtype, sample_type = spike_train.dtype, type(spike_train)
+                progress.update(len(decoded))
+
+        attributes = {
+            name: np.asarray(attribute_values)
+            for name, attribute_values in values.items()
+            if length > 0 and all(value is not None for value in attribute_values)
+        }
+        offsets = np.zeros(length + 1, dtype=np.int64)
+        np.cumsum([sample.size for sample in samples], out=offsets[1:])
+
+        shared = cls.__new__(cls)
+        shared._allocate(dtype, offsets, labels, attributes, sample_type)
+        shared._events.setflags(write=True)
+        for i in range(length):
+            shared._events[offsets[i] : offsets[i + 1]] = samples[i]
+            samples[i] = None
+        shared._events.setflags(write=False)
+        return shared
+
+    def _map(self):
+        self._events = np.ndarray(self._count, dtype=self._dtype, buffer=self._shm.buf)
+        self._events.setflags(write=False)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shm"] = self._shm.name
+        del state["_events"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shm = _attach(self._shm, self._owner)
+        self._map()
+
+    def __len__(self):
+        return self.offsets.size - 1
+
+    def __getitem__(self, index):
+        spike_train = self._events[self.offsets[index] : self.offsets[index + 1]].view(self.sample_type)
+        for name, values in self.attributes.items():
+            setattr(spike_train, name, values[index].item())
+        return spike_train, self.labels[index]
+
+    @property
+    def nbytes(self) -> int:
+        return self._shm.size
+
+    def close(self):
+        """Detach from the shared memory block, and free it in the creating process"""
+        if self._shm is None:
+            return
+        self._events = None
+        try:
+            self._shm.close()
+        except BufferError:  # Samples still reference the block, it is unmapped once they are collected
+            pass
+        if os.getpid() == self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __del__(self):
+        if getattr(self, "_shm", None) is not None and not isinstance(self._shm, str):
+            self.close()
@@ -1,15 +1,53 @@
-from pint import UnitRegistry as _UR
+"""Global time management namespace
 
-_reg = _UR()
+The pint registry is expensive to build, it is only created on first access of one of the units below.
+"""
 
-wunits = _reg.wraps
+_reg = None
 
-## Global time management namespace
-second = s = _reg.s
-millisecond = ms = _reg.ms
-microsecond = us = _reg.us
-nanosecond = ns = _reg.ns
-killosecond = ks = _reg.ks
-hertz = Hz = _reg.Hz
-millihertz = mhertz = mHz = _reg.mHz
-kilohertz = khertz = kHz = _reg.kHz
+_UNITS = {
+    "second": "s",
+    "s": "s",
+    "millisecond": "ms",
+    "ms": "ms",
+    "microsecond": "us",
+    "us": "us",
+    "nanosecond": "ns",
+    "ns": "ns",
+    "killosecond": "ks",
+    "ks": "ks",
+    "hertz": "Hz",
+    "Hz": "Hz",
+    "millihertz": "mHz",
+    "mhertz": "mHz",
+    "mHz": "mHz",
+    "kilohertz": "kHz",
+    "khertz": "kHz",
+    "kHz": "kHz",
+}
+
+__all__ = ["wunits"] + list(_UNITS)
+
+
+def _registry():
+    global _reg
+    if _reg is None:
+        from pint import UnitRegistry
+
+        _reg = UnitRegistry()
+    return _reg
+
+
+def __getattr__(name):
+    if name == "wunits":
+        value = _registry().wraps
+    elif name in _UNITS:
+        value = getattr(_registry(), _UNITS[name])
+    else:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    globals()[name] = value  # Cache it, next lookups won't go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
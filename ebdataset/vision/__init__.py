@@ -1,7 +1,17 @@
 """This subpackage regroups vision-based spiking dataset"""
-from .ibm_gesture import IBMGesture, H5IBMGesture
-from .ini_ucf50 import INIUCF50
-from .ncaltech101 import NCaltech101
-from .nmnist import NMnist
-from .ini_roshambo import INIRoshambo
-from .prophesee_ncars import PropheseeNCars
+from ..utils.lazy import lazy_attributes
+
+_LAZY_ATTRIBUTES = {
+    "IBMGesture": ".ibm_gesture",
+    "H5IBMGesture": ".ibm_gesture",
+    "AedatIBMGesture": ".ibm_gesture",
+    "INIUCF50": ".ini_ucf50",
+    "NCaltech101": ".ncaltech101",
+    "NMnist": ".nmnist",
+    "INIRoshambo": ".ini_roshambo",
+    "PropheseeNCars": ".prophesee_ncars",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+__getattr__, __dir__ = lazy_attributes(__name__, _LAZY_ATTRIBUTES)
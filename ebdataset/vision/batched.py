@@ -0,0 +1,49 @@
+"""Base class of the datasets storing every sample in its own event file"""
+
+import numpy as np
+from torch.utils import data
+
+
+class BatchDecodedDataset(data.Dataset):
+    """Dataset of one event file per sample, files being decoded several at once with a batch decoder
+
+    Single samples and DataLoader batches (__getitems__) are decoded by the same code path,
+    so they are identical. Subclasses fill _files, _labels, _archive (ZipReader or None),
+    transforms and _shared, and set _decode_files to a decoder of a list of paths or raw bytes
+    returning a DVSSpikeTrainBatch.
+    """
+
+    sensor_size = None  # (width, height) of the sensor in pixels
+    _sample_duration = None  # Duration of every sample, otherwise the time stamp of its last event + 1
+    _decode_files = None
+
+    def __len__(self):
+        return len(self._files)
+
+    def _load_many(self, indices) -> list:
+        """Decode the samples of indices, without transforms"""
+        files = self._files[np.asarray(indices, dtype=np.int64)]
+        sources = [self._archive.read(file) for file in files] if self._archive is not None else files.tolist()
+        batch = self._decode_files(sources)
+        batch.width, batch.height = self.sensor_size
+        if self._sample_duration is not None:
+            batch.durations = np.full(len(batch), self._sample_duration, dtype=np.int64)
+        return [(batch[i], self._labels[index]) for i, index in enumerate(indices)]
+
+    def _load(self, index):
+        return self._load_many([index])[0]
+
+    def _transform(self, sample):
+        spike_train, label = sample
+        if self.transforms is not None:
+            spike_train = self.transforms(spike_train)
+        return spike_train, label
+
+    def __getitem__(self, index):
+        return self._transform(self._shared[index] if self._shared is not None else self._load(index))
+
+    def __getitems__(self, indices):
+        """Decode the samples of a whole DataLoader batch in a single call"""
+        if self._shared is not None:
+            return [self[index] for index in indices]
+        return [self._transform(sample) for sample in self._load_many(indices)]
@@ -0,0 +1,109 @@
+"""Compact event codec for caching DVSSpikeTrain
+
+A DVSSpikeTrain takes 13 bytes per event. The codec bit-packs x, y and p into the smallest word
+holding them (2 bytes for a 128x128 sensor, 4 bytes up to 32768x32768) and delta-encodes the timestamps
+with the smallest unsigned integer holding the largest gap, typically 1 or 2 bytes.
+
+An encoded spike train is a single np.uint8 array (header, words, deltas), so it can be stored
+as is in h5 variable length datasets. Decoding is a handful of vectorized NumPy operations.
+"""
+import numpy as np
+from .type import DVSSpikeTrain
+
+_VERSION = 1
+_HEADER_DTYPE = np.dtype(
+    [
+        ("version", np.uint8),
+        ("x_bits", np.uint8),
+        ("y_bits", np.uint8),
+        ("word_bytes", np.uint8),
+        ("delta_bytes", np.uint8),
+        ("signed", np.uint8),  # Signed deltas, used when the timestamps aren't sorted
+        ("padding", np.uint16),
+        ("count", "<u8"),
+        ("t0", "<u8"),
+    ]
+)
+_UNSIGNED = {1: np.dtype("<u1"), 2: np.dtype("<u2"), 4: np.dtype("<u4"), 8: np.dtype("<u8")}
+
+
+def _nb_bits(max_value: int) -> int:
+    return max(int(max_value).bit_length(), 1)
+
+
+def _smallest_unsigned(max_value: int) -> int:
+    return next(nb_bytes for nb_bytes in (1, 2, 4, 8) if max_value < 2 ** (8 * nb_bytes))
+
+
+def encode(spike_train) -> np.ndarray:
+    """Encode the events of a DVSSpikeTrain (or any record array with x, y, p and ts fields)
+
+    Returns:
+        np.ndarray -- Encoded events as a np.uint8 array
+    """
+    count = len(spike_train)
+    x = np.asarray(spike_train.x, dtype=np.uint64)
+    y = np.asarray(spike_train.y, dtype=np.uint64)
+    ts = np.asarray(spike_train.ts, dtype=np.uint64)
+
+    header = np.zeros(1, dtype=_HEADER_DTYPE)
+    header["version"] = _VERSION
+    header["count"] = count
+    header["x_bits"] = x_bits = _nb_bits(x.max(initial=0))
+    header["y_bits"] = y_bits = _nb_bits(y.max(initial=0))
+    header["word_bytes"] = word_bytes = _smallest_unsigned(2 ** (x_bits + y_bits + 1) - 1)
+
+    words = (x << np.uint64(y_bits + 1)) | (y << np.uint64(1)) | np.asarray(spike_train.p, dtype=np.uint64)
+    words = words.astype(_UNSIGNED[word_bytes])
+
+    t0 = int(ts[0]) if count > 0 else 0
+    header["t0"] = t0
+    deltas = np.zeros(count, dtype=np.int64)
+    deltas[1:] = np.diff(ts.view(np.int64))
+    if np.any(deltas < 0):  # Unsorted timestamps, fall back to signed 8 bytes deltas
+        header["signed"] = 1
+        header["delta_bytes"] = 8
+        deltas = deltas.astype("<i8")
+    else:
+        header["delta_bytes"] = delta_bytes = _smallest_unsigned(deltas.max(initial=0))
+        deltas = deltas.astype(_UNSIGNED[delta_bytes])
+
+    return np.concatenate((header.view(np.uint8), words.view(np.uint8), deltas.view(np.uint8)))
+
+
+def decode(buffer, **metadata) -> DVSSpikeTrain:
+    """Decode events encoded with encode
+
+    Arguments:
+        buffer {bytes-like} -- Encoded events
+
+    Keyword Arguments:
+        metadata -- width, height, duration and time_scale of the returned DVSSpikeTrain
+
+    Returns:
+        DVSSpikeTrain -- The decoded events
+    """
+    buffer = np.frombuffer(buffer, dtype=np.uint8)
+    header = buffer[: _HEADER_DTYPE.itemsize].view(_HEADER_DTYPE)[0]
+    assert header["version"] == _VERSION, "Unsupported codec version %i" % header["version"]
+
+    count = int(header["count"])
+    y_bits = int(header["y_bits"])
+    word_bytes = int(header["word_bytes"])
+    delta_bytes = int(header["delta_bytes"])
+    offset = _HEADER_DTYPE.itemsize
+
+    words = np.frombuffer(buffer, dtype=_UNSIGNED[word_bytes], count=count, offset=offset)
+    offset += count * word_bytes
+    delta_dtype = np.dtype("<i8") if header["signed"] else _UNSIGNED[delta_bytes]
+    deltas = np.frombuffer(buffer, dtype=delta_dtype, count=count, offset=offset)
+
+    word = words.dtype.type
+    spike_train = DVSSpikeTrain(count, **metadata)
+    spike_train.p = words & word(1)
+    spike_train.y = (words >> word(1)) & word((1 << y_bits) - 1)
+    spike_train.x = words >> word(y_bits + 1)
+    ts = np.cumsum(deltas, dtype=np.int64 if header["signed"] else np.uint64)
+    ts += np.array(header["t0"]).astype(ts.dtype)
+    spike_train.ts = ts
+    return spike_train
@@ -1,12 +1,85 @@
 import os
 import re
+from collections import OrderedDict
 from typing import List, Tuple, Union
 import numpy as np
 from torch.utils import data
 import h5py
 from tqdm import tqdm
 from .parsers.aedat import readAEDATv3
-from .type import DVSSpikeTrain
+from .type import DVSSpikeTrain, DVSSpikeTrainBatch
+from . import codec
+from ..utils.sharding import get_shard_info, shard_indices
+from ..utils.parallel import bounded_map
+from ..utils.pipeline import Batch, Pipeline, Stage
+from ..utils.samplers import GroupedSampler
+from ..utils.shared import SharedEvents
+
+
+def _slice_window(recording: DVSSpikeTrain, start_time: int, end_time: int) -> DVSSpikeTrain:
+    """Extract the events of a labeled window from a full recording, with time starting at 0"""
+    event_mask = (recording.ts >= start_time) & (recording.ts < end_time)
+    ts = recording.ts[event_mask] - start_time
+    spike_train = DVSSpikeTrain(ts.size, duration=end_time - start_time + 1)
+    spike_train.width, spike_train.height = IBMGesture.sensor_size
+    spike_train.ts = ts
+    spike_train.x = recording.x[event_mask]
+    spike_train.y = recording.y[event_mask]
+    spike_train.p = recording.p[event_mask]
+    return spike_train
+
+
+def _object_array(samples: list) -> np.ndarray:
+    """(number of samples, 2) object array of (spike train, label) rows, np.array can't build it from ragged samples"""
+    values = np.empty((len(samples), 2), dtype=object)
+    for i, sample in enumerate(samples):
+        values[i] = sample
+    return values
+
+
+def _read_labels(file: str) -> np.ndarray:
+    """Labeled windows (event, start_time, end_time) of a recording, read from the _labels.csv file next to it"""
+    labels_file = file.replace(".aedat", "_labels.csv")
+    assert os.path.exists(labels_file), "File %s doesn't exist" % labels_file
+    return np.atleast_1d(np.genfromtxt(labels_file, delimiter=",", skip_header=1, dtype=IBMGesture._LABELS_DTYPE))
+
+
+def _recording_samples(file: str) -> list:
+    """Decode a recording and slice it into its labeled (spike train, label) samples"""
+    recording = readAEDATv3(file)
+    return [
+        (_slice_window(recording, start_time, end_time), label_id)
+        for (label_id, start_time, end_time) in _read_labels(file)
+    ]
+
+
+class _ApplyTransforms(object):
+    """Apply transforms to the spike train of a (spike train, label) sample, picklable for process stages"""
+
+    def __init__(self, transforms):
+        self.transforms = transforms
+
+    def __call__(self, sample):
+        spike_train, label = sample
+        return self.transforms(spike_train), label
+
+
+def _recording_columns(file: str) -> tuple:
+    """Decode a recording and concatenate the x, y, p and ts columns of its labeled windows
+
+    Returns:
+        tuple -- (x, y, p, ts, number of events per window, window durations, window labels)
+    """
+    labels = _read_labels(file)
+    recording = readAEDATv3(file)
+    windows = [_slice_window(recording, start_time, end_time) for (_, start_time, end_time) in labels]
+    columns = tuple(
+        np.concatenate([window[name] for window in windows]) if windows else np.zeros(0, recording.dtype[name])
+        for name in ("x", "y", "p", "ts")
+    )
+    counts = np.array([len(window) for window in windows], dtype=np.int64)
+    durations = np.array([window.duration for window in windows], dtype=np.int64)
+    return columns + (counts, durations, labels["event"])
 
 
 class IBMGesture(object):
@@ -22,6 +95,7 @@ class IBMGesture(object):
     https://inivation.com/support4/software/fileformat/#aedat-31
     """
 
+    sensor_size = (128, 128)  # (width, height) of the DVS128 sensor in pixels
     _GESTURE_MAPPING_FILE = "gesture_mapping.csv"
     _TRAIN_TRIALS_FILE = "trials_to_train.txt"
     _TEST_TRIALS_FILE = "trials_to_test.txt"
@@ -74,10 +148,6 @@ class IBMGesture(object):
             np.random.shuffle(self._TRAIN_FILES)
             np.random.shuffle(self._TEST_FILES)
 
-    def _read_labels(self, file: str) -> np.array:
-        assert os.path.exists(file), "File %s doesn't exist" % file
-        return np.genfromtxt(file, delimiter=",", skip_header=1, dtype=self._LABELS_DTYPE)
-
     def _parse_filename(self, file: str) -> Tuple[str, str, str]:
         trial = re.search(r"^user([0-9]+)_(.+)\.(aedat|csv)$", file, re.IGNORECASE)
         if trial:
@@ -96,74 +166,269 @@ class IBMGesture(object):
         """
         return self._GESTURE_MAP[int(label_id)].rstrip()
 
+    def _shard_files(self, files: List[str], epoch: int, seed: int) -> List[str]:
+        """Files belonging to the current (rank, worker) shard for an epoch
+        The files are sorted first so that every rank agrees on the partition regardless of the shuffle"""
+        files = sorted(files)
+        return [files[i] for i in shard_indices(len(files), get_shard_info(), epoch=epoch, seed=seed)]
+
     def _create_generator(self, files: List[str]):
         """Create a generator that yield samples over the array of files"""
         for file in files:
-            labels = self._read_labels(file.replace(".aedat", "_labels.csv"))
+            labels = _read_labels(file)
             multilabel_spike_train = readAEDATv3(file)
             for (label_id, start_time, end_time) in labels:
-                event_mask = (multilabel_spike_train.ts >= start_time) & (multilabel_spike_train.ts < end_time)
-                ts = multilabel_spike_train.ts[event_mask] - start_time
-                spike_train = DVSSpikeTrain(ts.size, width=128, height=128, duration=end_time - start_time + 1)
-                spike_train.ts = ts
-                spike_train.x = multilabel_spike_train.x[event_mask]
-                spike_train.y = multilabel_spike_train.y[event_mask]
-                spike_train.p = multilabel_spike_train.p[event_mask]
-                yield spike_train, label_id
-
-    def train_values_generator(self):
+                yield _slice_window(multilabel_spike_train, start_time, end_time), label_id
+
+    def train_values_generator(self, sharded: bool = False, epoch: int = 0, seed: int = 0):
         """Create a generator iterating over the training samples
         The files are loaded in memory ad hoc
         Each sample is a tuple containing the spikes positions (x, y, polarity),
-        the spike timing (in microsecond) and the label (int)"""
-        return self._create_generator(self._TRAIN_FILES)
+        the spike timing (in microsecond) and the label (int)
+
+        Keyword Arguments:
+            sharded {bool} -- Only iterate over the recordings of the current distributed rank and
+            DataLoader worker, shards are disjoint and reshuffled every epoch (default: {False})
+            epoch {int} -- Epoch used to shuffle the recordings between shards (default: {0})
+            seed {int} -- Seed shared by all the shards (default: {0})
+        """
+        files = self._shard_files(self._TRAIN_FILES, epoch, seed) if sharded else self._TRAIN_FILES
+        return self._create_generator(files)
 
-    def test_values_generator(self):
+    def test_values_generator(self, sharded: bool = False, epoch: int = 0, seed: int = 0):
         """Create a generator iterating over the test samples
         The files are loaded in memory ad hoc
         Each sample is a tuple containing the spikes positions (x, y, polarity),
-        the spike timing (in microsecond) and the label (int)"""
-        return self._create_generator(self._TEST_FILES)
+        the spike timing (in microsecond) and the label (int)
+
+        Keyword Arguments:
+            sharded {bool} -- Only iterate over the recordings of the current distributed rank and
+            DataLoader worker, shards are disjoint and reshuffled every epoch (default: {False})
+            epoch {int} -- Epoch used to shuffle the recordings between shards (default: {0})
+            seed {int} -- Seed shared by all the shards (default: {0})
+        """
+        files = self._shard_files(self._TEST_FILES, epoch, seed) if sharded else self._TEST_FILES
+        return self._create_generator(files)
+
+    def _create_pipeline(self, files, transforms, batch_size, collate_fn, num_workers, transform_workers):
+        stages = [Stage(_recording_samples, num_workers=num_workers, kind="process", flat=True, name="decode")]
+        if transforms is not None:
+            stages.append(Stage(_ApplyTransforms(transforms), num_workers=transform_workers, name="transform"))
+        if batch_size is not None:
+            stages.append(Batch(batch_size, collate_fn=collate_fn))
+        return Pipeline(files, *stages)
+
+    def train_pipeline(
+        self,
+        transforms=None,
+        batch_size: int = None,
+        collate_fn=None,
+        num_workers: int = 2,
+        transform_workers: int = 1,
+        sharded: bool = False,
+        epoch: int = 0,
+        seed: int = 0,
+    ) -> Pipeline:
+        """Streaming pipeline over the training samples: recordings are decoded and sliced in a process pool,
+        then transformed in a thread pool and batched. Samples keep the order of train_values_generator.
+        Iterate the returned pipeline to get the samples, and call its report method to see the throughput
+        of every stage.
+
+        Keyword Arguments:
+            transforms -- Transforms applied to the spike trains (default: {None})
+            batch_size {int} -- Group the samples in batches, None yields single samples (default: {None})
+            collate_fn {callable} -- Function applied to the list of samples of a batch,
+            e.g. vision.type.collate_spike_trains (default: {None})
+            num_workers {int} -- Number of processes decoding the recordings (default: {2})
+            transform_workers {int} -- Number of threads applying the transforms (default: {1})
+            sharded {bool} -- Only use the recordings of the current distributed rank and
+            DataLoader worker, see train_values_generator (default: {False})
+            epoch {int} -- Epoch used to shuffle the recordings between shards (default: {0})
+            seed {int} -- Seed shared by all the shards (default: {0})
+        """
+        files = self._shard_files(self._TRAIN_FILES, epoch, seed) if sharded else self._TRAIN_FILES
+        return self._create_pipeline(files, transforms, batch_size, collate_fn, num_workers, transform_workers)
+
+    def test_pipeline(
+        self,
+        transforms=None,
+        batch_size: int = None,
+        collate_fn=None,
+        num_workers: int = 2,
+        transform_workers: int = 1,
+        sharded: bool = False,
+        epoch: int = 0,
+        seed: int = 0,
+    ) -> Pipeline:
+        """Streaming pipeline over the test samples, see train_pipeline"""
+        files = self._shard_files(self._TEST_FILES, epoch, seed) if sharded else self._TEST_FILES
+        return self._create_pipeline(files, transforms, batch_size, collate_fn, num_workers, transform_workers)
+
+    def _load_columns(self, files: List[str], num_workers: int) -> Tuple[DVSSpikeTrainBatch, np.ndarray]:
+        num_workers = (os.cpu_count() or 1) if num_workers is None else num_workers
+        parts = list(bounded_map(_recording_columns, files, num_workers=num_workers))
+        x, y, p, ts, counts, durations, labels = (
+            np.concatenate([part[i] for part in parts]) if parts else np.zeros(0) for i in range(7)
+        )
+        offsets = np.zeros(counts.size + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        batch = DVSSpikeTrainBatch(x, y, p, ts, offsets, *self.sensor_size, durations=durations)
+        return batch, labels.astype(np.uint8)
+
+    def train_columns(self, num_workers: int = None) -> Tuple[DVSSpikeTrainBatch, np.ndarray]:
+        """Load the entire training split in memory as contiguous columns
+        Recordings are decoded in parallel and the samples keep the order of the files
+
+        Keyword Arguments:
+            num_workers {int} -- Number of processes decoding the recordings, 0 to decode them in the calling
+            process (default: {None}, one per cpu)
+
+        Returns:
+            tuple -- (DVSSpikeTrainBatch holding the x, y, p and ts columns and the offsets of every sample,
+            np.ndarray of the labels)
+        """
+        return self._load_columns(self._TRAIN_FILES, num_workers)
+
+    def test_columns(self, num_workers: int = None) -> Tuple[DVSSpikeTrainBatch, np.ndarray]:
+        """Load the entire test split in memory as contiguous columns
+        Recordings are decoded in parallel and the samples keep the order of the files
+
+        Keyword Arguments:
+            num_workers {int} -- Number of processes decoding the recordings, 0 to decode them in the calling
+            process (default: {None}, one per cpu)
+
+        Returns:
+            tuple -- (DVSSpikeTrainBatch holding the x, y, p and ts columns and the offsets of every sample,
+            np.ndarray of the labels)
+        """
+        return self._load_columns(self._TEST_FILES, num_workers)
 
     def train_values(self):
         """Load and return the entire training dataset in memory
+        Prefer train_columns, which is faster and much more compact
         Returns:
             np.array -- with shape (number of samples, 3) where the inner 3 represents:
             the spikes positions (x, y, polarity), the spike timing (in microsecond), and the label (int)
         """
-        return np.array([i for i in self.train_values_generator()])
+        return _object_array(list(self.train_values_generator()))
 
     def test_values(self):
         """Load and return the entire test dataset in memory
+        Prefer test_columns, which is faster and much more compact
         Returns:
             np.array -- with shape (number of samples, 3) where the inner 3 represents:
             the spikes positions (x, y, polarity), the spike timing (in microsecond), and the label (int)
         """
-        return np.array([i for i in self.test_values_generator()])
+        return _object_array(list(self.test_values_generator()))
+
+
+class AedatIBMGesture(data.Dataset):
+    """Map-style DVS Gesture dataset reading the raw AEDAT 3.1 recordings, without the H5 conversion step
+
+    The (recording, label window) index is built from the _labels.csv files at construction.
+    Each recording holds several gestures, the last decoded recordings are kept in a small LRU cache
+    so that consecutive windows of a recording only decode it once. Use the sampler method to
+    get a sampler visiting the windows grouped by recording.
+    """
+
+    sensor_size = IBMGesture.sensor_size
+
+    def __init__(self, path: str, is_train: bool = True, transforms=None, cache_size: int = 2):
+        """
+        Arguments:
+            path {str} -- The directory of the unzipped tarball containing the dataset
+
+        Keyword Arguments:
+            is_train {bool} -- Load the training recordings (default: {True})
+            transforms -- torchvision-like transforms (default: {None})
+            cache_size {int} -- Number of decoded recordings kept in memory per worker (default: {2})
+        """
+        gestures = IBMGesture(path, shuffle=False)
+        self._GESTURE_MAP = gestures._GESTURE_MAP
+        self._recordings = sorted(gestures._TRAIN_FILES if is_train else gestures._TEST_FILES)
+
+        recording_ids, labels, start_times, end_times = [], [], [], []
+        for recording_id, file in enumerate(self._recordings):
+            windows = _read_labels(file)
+            recording_ids.append(np.full(windows.size, recording_id))
+            labels.append(windows["event"])
+            start_times.append(windows["start_time"])
+            end_times.append(windows["end_time"])
+
+        self._recording_ids = np.concatenate(recording_ids)
+        self._labels = np.concatenate(labels)
+        self._start_times = np.concatenate(start_times)
+        self._end_times = np.concatenate(end_times)
+
+        self.transforms = transforms
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def true_label(self, label_id: Union[str, int]) -> str:
+        """Return the label class name for a label id"""
+        return self._GESTURE_MAP[int(label_id)].rstrip()
+
+    def sampler(self, shuffle: bool = True, seed: int = 0) -> GroupedSampler:
+        """Sampler visiting the windows of each recording consecutively, so that every recording
+        is decoded once per epoch. Call set_epoch on it at the start of every epoch to reshuffle"""
+        return GroupedSampler(self._recording_ids, shuffle=shuffle, seed=seed)
+
+    def _read_recording(self, recording_id: int) -> DVSSpikeTrain:
+        if recording_id in self._cache:
+            self._cache.move_to_end(recording_id)
+            return self._cache[recording_id]
+
+        recording = readAEDATv3(self._recordings[recording_id])
+        self._cache[recording_id] = recording
+        while len(self._cache) > max(self.cache_size, 1):
+            self._cache.popitem(last=False)
+        return recording
+
+    def __getstate__(self):  # Workers start with an empty cache
+        state = self.__dict__.copy()
+        state["_cache"] = OrderedDict()
+        return state
+
+    def __len__(self):
+        return self._labels.size
+
+    def __getitem__(self, index):
+        recording = self._read_recording(self._recording_ids[index])
+        spike_train = _slice_window(recording, self._start_times[index], self._end_times[index])
+        if self.transforms is not None:
+            spike_train = self.transforms(spike_train)
+        return spike_train, self._labels[index]
 
 
 class H5IBMGesture(data.Dataset):
-    """DVS Gesture dataset cached into a H5 file - Use H5DvsGesture.convert to create the h5 file"""
+    """DVS Gesture dataset cached into a H5 file - Use H5DvsGesture.convert to create the h5 file
+    AedatIBMGesture offers the same random access directly over the raw recordings"""
+
+    sensor_size = IBMGesture.sensor_size
 
     _nb_of_samples = (1176, 288)  # in train, test
     _h5_prename = ("train", "test")
     _max_len = 19000000  # Recommended time padding (max duration of a sample)
 
-    def __init__(self, path: str, is_train: bool = True):
+    def __init__(self, path: str, is_train: bool = True, preload: str = None):
         """path: location of the DvsGesture h5 file
         is_train: load training data
+        preload: "shared" to decode the whole split once into shared memory, shared by the DataLoader workers
         """
         _, file_extension = os.path.splitext(path)
         if file_extension != ".h5":
             raise Exception("The dvs gesture must first be converted to a .h5 file. Please call H5DvsGesture.Convert")
+        assert preload in (None, "shared"), "Unknown preload mode %s" % preload
 
         self.indx = 0 if is_train else 1
         self.file_path = path
+        self._shared = SharedEvents.from_loader(self._load, len(self)) if preload == "shared" else None
 
     @staticmethod
-    def convert(dvs_folder_path: str, h5_output_path: str, verbose=True):
+    def convert(dvs_folder_path: str, h5_output_path: str, verbose=True, compress=False):
         """dvs_folder_path : Path of the extracted tarball
         h5_output_path : Path of the output h5 file
+        compress : Store the samples with the compact event codec (ebdataset.vision.codec), about 4 times smaller
         """
 
         _, file_extension = os.path.splitext(h5_output_path)
@@ -185,15 +450,21 @@ class H5IBMGesture(data.Dataset):
                 [train_gen, test_gen],
                 H5IBMGesture._nb_of_samples,
             ):
-                pos = f.create_dataset(name + "_pos", (length, 3), dtype=position_type)
-                tos = f.create_dataset(name + "_tos", (length,), dtype=time_type)
+                if compress:
+                    events = f.create_dataset(name + "_events", (length,), dtype=h5py.vlen_dtype(np.dtype("uint8")))
+                else:
+                    pos = f.create_dataset(name + "_pos", (length, 3), dtype=position_type)
+                    tos = f.create_dataset(name + "_tos", (length,), dtype=time_type)
                 label = f.create_dataset(name + "_label", (length,), dtype=np.uint8)
 
                 for i, (spike_train, label_id) in enumerate(gen):
-                    pos[i, 0] = spike_train.x
-                    pos[i, 1] = spike_train.y
-                    pos[i, 2] = spike_train.p
-                    tos[i] = spike_train.ts
+                    if compress:
+                        events[i] = codec.encode(spike_train)
+                    else:
+                        pos[i, 0] = spike_train.x
+                        pos[i, 1] = spike_train.y
+                        pos[i, 2] = spike_train.p
+                        tos[i] = spike_train.ts
                     label[i] = label_id
                     step_counter.update(1)
 
@@ -203,13 +474,26 @@ class H5IBMGesture(data.Dataset):
     def __getitem__(self, index):
         if index >= self._nb_of_samples[self.indx]:
             raise StopIteration
+        if self._shared is not None:
+            return self._shared[index]
+        return self._load(index)
+
+    def _load(self, index):
         with h5py.File(self.file_path, "r") as file_hndl:
             name = self._h5_prename[self.indx]
+            label = file_hndl[name + "_label"][index]
+            if name + "_events" in file_hndl:  # Converted with compress=True
+                spike_train = codec.decode(
+                    file_hndl[name + "_events"][index], width=self.sensor_size[0], height=self.sensor_size[1]
+                )
+                spike_train.duration = spike_train.ts.max() + 1
+                return spike_train, label
+
             pos = file_hndl[name + "_pos"][index]
             tos = file_hndl[name + "_tos"][index]
-            label = file_hndl[name + "_label"][index]
 
-        spike_train = DVSSpikeTrain(tos.size, width=128, height=128, duration=tos.max() + 1)
+        spike_train = DVSSpikeTrain(tos.size, duration=tos.max() + 1)
+        spike_train.width, spike_train.height = self.sensor_size
         spike_train.x = pos[0]
         spike_train.y = pos[1]
         spike_train.p = pos[2]
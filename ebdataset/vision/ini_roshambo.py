@@ -1,11 +1,137 @@
 import os
+import shutil
+from contextlib import contextmanager
+from functools import partial
 import numpy as np
 from h5py import File
 from tqdm import tqdm
 from .parsers.aedat import readAEDATv2_davies
 from torch.utils.data.dataset import Dataset
 from .type import DVSSpikeTrain
+from . import codec
 from ..utils.units import us, wunits
+from ..utils.parallel import bounded_map
+from ..utils.shared import SharedEvents
+
+_COMPLETED_ATTR = "completed_samples"  # Root attribute listing the source samples fully written
+_SOURCE_ATTR = "source"  # Source sample of every h5 dataset
+_CODEC_ATTR = "codec"  # Set on samples stored with the compact event codec
+_Y_FLIP_ATTR = "y_flip"  # Root attribute, convention used to move the origin of y to the upper left corner
+_Y_FLIP_SENSOR = "sensor_height"  # y flipped against the height of the sensor
+_Y_FLIP_SAMPLE = "sample_max"  # y flipped against the highest y of each sample, by earlier versions
+
+
+def _y_flip_of(f_hndl) -> str:
+    """Flip convention of an h5 file, files holding samples but no convention were written by earlier versions"""
+    return f_hndl.attrs.get(_Y_FLIP_ATTR, _Y_FLIP_SAMPLE if len(f_hndl) > 0 else _Y_FLIP_SENSOR)
+
+
+def _source_of(name: str) -> str:
+    """Source sample of a dataset written before conversions were incremental"""
+    return name if name.endswith(".aedat") else name.rsplit("_", 1)[0]
+
+
+@contextmanager
+def _incremental_h5(out_path: str, sources, y_flip: str = _Y_FLIP_SENSOR):
+    """Open the output h5 file of a conversion so that it can be interrupted and resumed
+
+    The conversion works on out_path + ".partial", which replaces out_path once it is over. out_path
+    itself is never modified: an existing output is copied to the partial file to be extended with new
+    samples, and isn't copied at all when it already holds every source sample.
+    Every dataset is tagged with its source sample, and the source sample is added to the
+    completed list only once all its datasets are written. Datasets of uncompleted source
+    samples, left by an interruption, are deleted on resume.
+
+    An interruption raising an exception (e.g. KeyboardInterrupt) loses at most the samples being written.
+    HDF5 doesn't protect its metadata from a process killed during a write: the partial file can then be
+    unreadable, delete it to restart the conversion from out_path.
+
+    Arguments:
+        out_path {str} -- Output h5 file
+        sources {list} -- Source samples of the conversion
+
+    Keyword Arguments:
+        y_flip {str} -- Flip convention of the samples, resuming a file written with another one
+        raises a ValueError (default: {"sensor_height"})
+
+    Yields:
+        tuple -- (h5 file handle, set of completed source samples, function to call once a sample is completed)
+    """
+    def check_y_flip(f_hndl):
+        if _y_flip_of(f_hndl) != y_flip:
+            raise ValueError(
+                "%s holds samples with y flipped by %s, can't add samples flipped by %s, convert to a new file"
+                % (out_path, _y_flip_of(f_hndl), y_flip)
+            )
+
+    partial_path = out_path + ".partial"
+    if not os.path.exists(partial_path) and os.path.exists(out_path):
+        with File(out_path, "r", libver="latest") as f_hndl:
+            check_y_flip(f_hndl)
+            if _COMPLETED_ATTR in f_hndl.attrs and set(sources) <= set(f_hndl.attrs[_COMPLETED_ATTR]):
+                yield f_hndl, set(f_hndl.attrs[_COMPLETED_ATTR]), None  # Nothing to convert
+                return
+        shutil.copyfile(out_path, partial_path)
+
+    with File(partial_path, "a", libver="latest") as f_hndl:
+        check_y_flip(f_hndl)
+        f_hndl.attrs[_Y_FLIP_ATTR] = y_flip
+
+        if _COMPLETED_ATTR not in f_hndl.attrs:  # New file or file written by a previous version
+            for name, dataset in f_hndl.items():
+                dataset.attrs[_SOURCE_ATTR] = _source_of(name)
+            f_hndl.attrs[_COMPLETED_ATTR] = sorted({_source_of(name) for name in f_hndl.keys()})
+
+        completed = set(f_hndl.attrs[_COMPLETED_ATTR])
+        for name in [name for name, dataset in f_hndl.items() if dataset.attrs[_SOURCE_ATTR] not in completed]:
+            del f_hndl[name]
+
+        def commit(sample_id):
+            completed.add(sample_id)
+            f_hndl.attrs[_COMPLETED_ATTR] = sorted(completed)
+            f_hndl.flush()
+
+        yield f_hndl, completed, commit
+
+    os.replace(partial_path, out_path)
+
+
+def _list_aedat_samples(path: str, with_backgrounds: bool):
+    samples = filter(lambda f: os.path.splitext(f)[1] == ".aedat", os.listdir(path))
+    if not with_backgrounds:
+        samples = filter(lambda f: not ("background" in f), samples)
+    return sorted(samples)
+
+
+def _read_aedat_sample(filename: str) -> DVSSpikeTrain:
+    sparse_spike_train = readAEDATv2_davies(filename, height=INIRoshambo.sensor_size[1])
+    sparse_spike_train.ts = sparse_spike_train.ts - np.min(sparse_spike_train.ts)  # Start the sample at t=0
+    return sparse_spike_train
+
+
+def _split_sample(dataset, duration_per_sample: int, index: int):
+    """Cut a sample of the dataset into subsamples of duration_per_sample, skipping the almost empty ones"""
+    sample, label = dataset[index]
+    sample_id = dataset.samples[index]
+    label_test, *_ = os.path.splitext(sample_id)[0].split("_")
+    assert label_test == label  # Making sure there is no mix up
+    total_duration = np.max(sample.ts) + 1
+    sub_samples = []
+    for j, start_time in enumerate(range(0, total_duration, duration_per_sample)):
+        if start_time + duration_per_sample > total_duration:  # End
+            break
+        sub_mask = (sample.ts >= start_time) & (sample.ts < start_time + duration_per_sample)
+        nb_of_spikes = np.sum(sub_mask)
+        if nb_of_spikes <= 10:
+            continue
+        sub_sample = DVSSpikeTrain(nb_of_spikes, duration=duration_per_sample)
+        sub_sample.ts = sample.ts[sub_mask]
+        sub_sample.ts = sub_sample.ts - np.min(sub_sample.ts)  # Start at 0
+        sub_sample.x = sample.x[sub_mask]
+        sub_sample.y = sample.y[sub_mask]
+        sub_sample.p = sample.p[sub_mask]
+        sub_samples.append((f"{sample_id}_{j}", sub_sample))
+    return sample_id, sub_samples
 
 
 class INIRoshambo(Dataset):
@@ -19,18 +145,22 @@ class INIRoshambo(Dataset):
     https://docs.google.com/document/d/e/2PACX-1vTNWYgwyhrutBu5GpUSLXC4xSHzBbcZreoj0ljE837m9Uk5FjYymdviBJ5rz-f2R96RHrGfiroHZRoH/pub
     """
 
-    def __init__(self, path: str, with_backgrounds=False, transforms=None):
+    sensor_size = (240, 180)  # (width, height) of the DAVIS240 sensor in pixels
+
+    def __init__(self, path: str, with_backgrounds=False, transforms=None, preload: str = None):
         """
         :param path: path of the aedat folder or h5 file (faster)
         :param transforms: torchvision-like transforms (optional)
+        :param preload: "shared" to decode every sample once into shared memory, shared by the DataLoader workers
         """
         assert os.path.exists(path)
+        assert preload in (None, "shared"), "Unknown preload mode %s" % preload
 
         self.path = path
 
         if os.path.isdir(path):  # AEDat v2 directory
             self.backend = "aedat"
-            self.samples = filter(lambda f: os.path.splitext(f)[1] == ".aedat", os.listdir(path))
+            self.samples = _list_aedat_samples(path, with_backgrounds=True)
         elif os.path.splitext(path)[1] == ".h5":
             self.backend = "h5"
             with File(path, "r", libver="latest") as f_hndl:
@@ -42,13 +172,19 @@ class INIRoshambo(Dataset):
         self.samples = list(self.samples)
         self.transforms = transforms
         self.with_backgrounds = with_backgrounds
+        self._shared = SharedEvents.from_loader(self._load, len(self)) if preload == "shared" else None
 
-    def convert(self, out_path, verbose=False):
+    def convert(self, out_path, verbose=False, num_workers=0, compress=False):
         """
         Converts a aedat directory to a h5 file for faster processing
 
-        :param path: Aedat directory
+        The conversion can be interrupted and resumed by calling convert again with the same out_path,
+        only the samples that are not already in the h5 file are converted. This also adds to an existing
+        h5 file the .aedat files that appeared in the directory since it was created.
+
         :param out_path:  Output h5 file
+        :param num_workers: Number of processes decoding the aedat files, 0 decodes in the calling process
+        :param compress: Store the samples with the compact event codec (ebdataset.vision.codec)
         :return: New Roshambo object with h5 file as backend
         """
 
@@ -58,66 +194,81 @@ class INIRoshambo(Dataset):
         if not (".h5" in out_path):
             out_path += ".h5"
 
-        with File(out_path, "w-", libver="latest") as f_hndl:
-            for sample_id in tqdm(self.samples, disable=not verbose):
-                sparse_spike_train = readAEDATv2_davies(os.path.join(self.path, sample_id))
-                sparse_spike_train.ts = sparse_spike_train.ts - np.min(sparse_spike_train.ts)  # Start the sample at t=0
-                f_hndl[sample_id] = sparse_spike_train
+        all_sample_ids = _list_aedat_samples(self.path, self.with_backgrounds)
+        with _incremental_h5(out_path, all_sample_ids) as (f_hndl, completed, commit):
+            sample_ids = [s for s in all_sample_ids if s not in completed]
+            filenames = [os.path.join(self.path, sample_id) for sample_id in sample_ids]
+            sparse_spike_trains = bounded_map(_read_aedat_sample, filenames, num_workers)
+            # The decoding generator is consumed first, so that the process pool is shut down once it is exhausted
+            for sparse_spike_train, sample_id in tqdm(
+                zip(sparse_spike_trains, sample_ids), total=len(sample_ids), disable=not verbose
+            ):
+                f_hndl[sample_id] = codec.encode(sparse_spike_train) if compress else sparse_spike_train
+                f_hndl[sample_id].attrs[_SOURCE_ATTR] = sample_id
+                if compress:
+                    f_hndl[sample_id].attrs[_CODEC_ATTR] = True
+                commit(sample_id)
 
         return INIRoshambo(out_path, with_backgrounds=self.with_backgrounds, transforms=self.transforms)
 
-    @wunits(None, (None, None, us, None))
-    def split_to_subsamples(self, out_path, duration_per_sample, verbose=False):
+    @wunits(None, (None, None, us, None, None))
+    def split_to_subsamples(self, out_path, duration_per_sample, verbose=False, num_workers=0):
+        """
+        Cut every sample in subsamples of duration_per_sample and save them in a h5 file
+
+        Like convert, the split can be interrupted and resumed, and extended with new samples later on.
+
+        :param out_path: Output h5 file
+        :param duration_per_sample: Duration of the subsamples
+        :param num_workers: Number of processes splitting the samples, 0 splits in the calling process
+        """
         if not (".h5" in out_path):
             out_path += ".h5"
 
         duration_per_sample = int(duration_per_sample)
 
-        with File(out_path, "w-", libver="latest") as f_hndl:
-            for i, (sample, label) in enumerate(tqdm(self, disable=not verbose)):
-                sample_id = self.samples[i]
-                label_test, *_ = os.path.splitext(sample_id)[0].split("_")
-                assert label_test == label  # Making sure there is no mix up
-                total_duration = np.max(sample.ts) + 1
-                for j, start_time in enumerate(
-                    tqdm(
-                        range(0, total_duration, duration_per_sample),
-                        disable=not verbose,
-                    )
-                ):
-                    if start_time + duration_per_sample > total_duration:  # End
-                        break
-                    sub_mask = (sample.ts >= start_time) & (sample.ts < start_time + duration_per_sample)
-                    nb_of_spikes = np.sum(sub_mask)
-                    if nb_of_spikes <= 10:
-                        continue
-                    sub_sample = DVSSpikeTrain(nb_of_spikes, duration=duration_per_sample)
-                    sub_sample.ts = sample.ts[sub_mask]
-                    sub_sample.ts = sub_sample.ts - np.min(sub_sample.ts)  # Start at 0
-                    sub_sample.x = sample.x[sub_mask]
-                    sub_sample.y = sample.y[sub_mask]
-                    sub_sample.p = sample.p[sub_mask]
-                    f_hndl[f"{sample_id}_{j}"] = sub_sample
+        y_flip = _Y_FLIP_SENSOR
+        if self.backend == "h5":  # Subsamples keep the convention of the converted samples
+            with File(self.path, "r", libver="latest") as f_hndl:
+                y_flip = _y_flip_of(f_hndl)
+
+        with _incremental_h5(out_path, self.samples, y_flip) as (f_hndl, completed, commit):
+            indices = [i for i, sample_id in enumerate(self.samples) if sample_id not in completed]
+            splits = bounded_map(partial(_split_sample, self, duration_per_sample), indices, num_workers)
+            for sample_id, sub_samples in tqdm(splits, total=len(indices), disable=not verbose):
+                for name, sub_sample in sub_samples:
+                    f_hndl[name] = sub_sample
+                    f_hndl[name].attrs[_SOURCE_ATTR] = sample_id
+                commit(sample_id)
 
     def __len__(self):
         return len(self.samples)
 
-    def __getitem__(self, index):
+    def _load(self, index):
         sample_id = self.samples[index]
         label, *extra_info = os.path.splitext(sample_id)[0].split("_")
         if self.backend == "aedat":
-            filename = os.path.join(self.path, sample_id)
-            sparse_spike_train = readAEDATv2_davies(filename)
-            sparse_spike_train.ts = sparse_spike_train.ts - np.min(sparse_spike_train.ts)  # Start the sample at t=0
+            sparse_spike_train = _read_aedat_sample(os.path.join(self.path, sample_id))
         elif self.backend == "h5":
             with File(self.path, "r", libver="latest") as f_hndl:
                 sparse_spike_train = f_hndl[sample_id][()]
-            sparse_spike_train = np.rec.array(sparse_spike_train, dtype=sparse_spike_train.dtype).view(DVSSpikeTrain)
+                is_encoded = f_hndl[sample_id].attrs.get(_CODEC_ATTR, False)
+            if is_encoded:
+                sparse_spike_train = codec.decode(sparse_spike_train)
+            else:
+                sparse_spike_train = np.rec.array(sparse_spike_train, dtype=sparse_spike_train.dtype)
+                sparse_spike_train = sparse_spike_train.view(DVSSpikeTrain)
 
-        sparse_spike_train.width = 240
-        sparse_spike_train.height = 180
+        sparse_spike_train.width, sparse_spike_train.height = self.sensor_size
         sparse_spike_train.duration = sparse_spike_train.ts.max() + 1
         sparse_spike_train.time_scale = 1e-6
+        return sparse_spike_train, label
+
+    def __getitem__(self, index):
+        if self._shared is not None:
+            sparse_spike_train, label = self._shared[index]
+        else:
+            sparse_spike_train, label = self._load(index)
 
         if self.transforms is not None:
             sparse_spike_train = self.transforms(sparse_spike_train)
@@ -13,6 +13,8 @@ class INIUCF50(data.Dataset):
     Available for download: https://dgyblog.com/projects-term/dvs-dataset.html
     """
 
+    sensor_size = (240, 180)  # (width, height) of the DAVIS240 sensor in pixels
+
     def __init__(self, path: str, transforms=None):
         assert os.path.exists(path)
         self._files = []
@@ -32,9 +34,8 @@ class INIUCF50(data.Dataset):
         return self._labels.size
 
     def __getitem__(self, index):
-        spike_train = readAEDATv2_davies(self._files[index])
-        spike_train.width = 240
-        spike_train.height = 180
+        spike_train = readAEDATv2_davies(self._files[index], height=self.sensor_size[1])
+        spike_train.width, spike_train.height = self.sensor_size
         spike_train.duration = spike_train.ts.max() + 1
         if self.transforms is not None:
             spike_train = self.transforms(spike_train)
@@ -1,10 +1,12 @@
 import os
 import numpy as np
-from torch.utils import data
-from .parsers.aer import readAERFile
+from .batched import BatchDecodedDataset
+from .parsers.aer import readAERFiles
+from ..utils import is_archive, ZipReader
+from ..utils.shared import SharedEvents
 
 
-class NCaltech101(data.Dataset):
+class NCaltech101(BatchDecodedDataset):
     """
     NCaltech101 dataset from
     Orchard, G.; Cohen, G.; Jayawant, A.; and Thakor, N.
@@ -12,31 +14,35 @@ class NCaltech101(data.Dataset):
     Frontiers in Neuroscience, vol.9, no.437, Oct. 2015
 
     Available for download: https://www.garrickorchard.com/datasets/n-caltech101
+
+    The path can either be the directory of the extracted dataset or its zip archive.
+    With preload="shared", the samples are decoded once into shared memory and shared by the DataLoader workers.
     """
 
-    def __init__(self, path: str, transforms=None):
+    sensor_size = (34, 34)  # (width, height) of the sensor in pixels
+    _decode_files = staticmethod(readAERFiles)
+
+    def __init__(self, path: str, transforms=None, preload: str = None):
         assert os.path.exists(path)
+        assert preload in (None, "shared"), "Unknown preload mode %s" % preload
         self._files = []
         self._labels = []
         self.transforms = transforms
-        for root, dirs, files in os.walk(path):
-            label = os.path.basename(root)
-            for file in files:
-                if file.endswith(".bin"):
-                    self._files.append(os.path.join(root, file))
-                    self._labels.append(label)
+        self._archive = None
+
+        if is_archive(path):
+            self._archive = ZipReader(path)
+            self._files, self._labels = self._archive.list_files(".bin")
+        else:
+            for root, dirs, files in os.walk(path):
+                label = os.path.basename(root)
+                for file in files:
+                    if file.endswith(".bin"):
+                        self._files.append(os.path.join(root, file))
+                        self._labels.append(label)
 
         self._files = np.array(self._files)
         self._labels = np.array(self._labels)
-
-    def __len__(self):
-        return len(self._labels)
-
-    def __getitem__(self, index):
-        spike_train = readAERFile(self._files[index])
-        spike_train.width = 34
-        spike_train.height = 34
-        spike_train.duration = spike_train.ts.max() + 1
-        if self.transforms is not None:
-            spike_train = self.transforms(spike_train)
-        return spike_train, self._labels[index]
+        self._shared = (
+            SharedEvents.from_loader(self._load, len(self), load_many=self._load_many) if preload == "shared" else None
+        )
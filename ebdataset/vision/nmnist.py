@@ -1,12 +1,13 @@
 import os
 import time
 import numpy as np
-from torch.utils import data
-from .parsers.aer import readAERFile
-from ..utils import download, unzip
+from .batched import BatchDecodedDataset
+from .parsers.aer import readAERFiles
+from ..utils import download, unzip, is_archive, ZipReader
+from ..utils.shared import SharedEvents
 
 
-class NMnist(data.Dataset):
+class NMnist(BatchDecodedDataset):
     """
     NMnist dataset from
     Orchard, G.; Cohen, G.; Jayawant, A.; and Thakor, N.
@@ -14,46 +15,86 @@ class NMnist(data.Dataset):
     Frontiers in Neuroscience, vol.9, no.437, Oct. 2015
 
     Available for download: https://www.garrickorchard.com/datasets/n-mnist
+
+    The path can either be the directory of the dataset or one of the Train.zip / Test.zip archives.
+    Samples are read directly from the archives when they are found instead of the extracted directories.
     """
 
-    def __init__(self, path: str, is_train: bool = True, transforms=None, download_if_missing=True):
-        if not os.path.exists(path) or len(os.listdir(path)) == 0:
+    sensor_size = (34, 34)  # (width, height) of the sensor in pixels
+    _decode_files = staticmethod(readAERFiles)
+
+    def __init__(
+        self,
+        path: str,
+        is_train: bool = True,
+        transforms=None,
+        download_if_missing=True,
+        extract: bool = True,
+        preload: str = None,
+    ):
+        """
+        Arguments:
+            path {str} -- Directory of the dataset or path of a Train.zip / Test.zip archive
+
+        Keyword Arguments:
+            is_train {bool} -- Load the training split (default: {True})
+            transforms -- torchvision-like transforms (default: {None})
+            download_if_missing {bool} -- Download the dataset if path is empty (default: {True})
+            extract {bool} -- Extract the downloaded archives, otherwise keep them as
+            Train.zip / Test.zip and read the samples from them (default: {True})
+            preload {str} -- "shared" to decode the whole split once into shared memory, shared by the
+            DataLoader workers (default: {None})
+        """
+        assert preload in (None, "shared"), "Unknown preload mode %s" % preload
+        self.transforms = transforms
+        self._archive = None
+        self._shared = None
+        split = "Train" if is_train else "Test"
+
+        if not os.path.exists(path) or (os.path.isdir(path) and len(os.listdir(path)) == 0):
             if download_if_missing:
-                self._download_and_unzip(path)
+                self._download_and_unzip(path, extract=extract)
             else:
-                raise "Data not found at path %s" % path
+                raise FileNotFoundError("Data not found at path %s" % path)
 
-        path = os.path.join(path, "Train" if is_train else "Test")
+        if os.path.isdir(path) and not os.path.isdir(os.path.join(path, split)):
+            path = os.path.join(path, split + ".zip")
 
-        self._files = []
-        self._labels = []
+        if is_archive(path):
+            self._archive = ZipReader(path)
+            files, digits = self._archive.list_files(".bin", split=split)
+            if len(files) == 0:
+                raise ValueError("Archive %s holds no %s samples, is_train doesn't match the archive" % (path, split))
+            self._files = np.asarray(files)
+            self._labels = np.asarray(digits, dtype=int)
+        else:
+            path = os.path.join(path, split)
 
-        for root, dirs, files in os.walk(path):
-            digit = os.path.basename(root)
-            for file in files:
-                if file.endswith(".bin"):
-                    self._files.append(os.path.join(root, file))
-                    self._labels.append(int(digit))
+            self._files = []
+            self._labels = []
 
-        self._files = np.asarray(self._files)
-        self._labels = np.asarray(self._labels)
-        self.transforms = transforms
+            for root, dirs, files in os.walk(path):
+                digit = os.path.basename(root)
+                for file in files:
+                    if file.endswith(".bin"):
+                        self._files.append(os.path.join(root, file))
+                        self._labels.append(int(digit))
 
-    def __len__(self):
-        return self._files.size
+            self._files = np.asarray(self._files)
+            self._labels = np.asarray(self._labels)
 
-    def __getitem__(self, index):
-        spike_train = readAERFile(self._files[index])
-        spike_train.width = 34
-        spike_train.height = 34
-        spike_train.duration = spike_train.ts.max() + 1
-        if self.transforms is not None:
-            spike_train = self.transforms(spike_train)
-        return spike_train, self._labels[index]
+        if preload == "shared":
+            self._shared = SharedEvents.from_loader(self._load, len(self), load_many=self._load_many)
 
-    def _download_and_unzip(self, output_directory):
+    def _download_and_unzip(self, output_directory, extract=True):
         train_url = "https://www.dropbox.com/sh/tg2ljlbmtzygrag/AABlMOuR15ugeOxMCX0Pvoxga/Train.zip?dl=1"
         test_url = "https://www.dropbox.com/sh/tg2ljlbmtzygrag/AADSKgJ2CjaBWh75HnTNZyhca/Test.zip?dl=1"
+
+        if not extract:  # Keep the archives, samples are read from them directly
+            return download(
+                train_url, os.path.join(output_directory, "Train.zip"), desc="Downloading training files"
+            ) and download(test_url, os.path.join(output_directory, "Test.zip"), desc="Downloading test files")
+
         train_loc = os.path.join(output_directory, "Train%i.zip" % time.time())
         test_loc = os.path.join(output_directory, "Test%i.zip" % time.time())
         success = (
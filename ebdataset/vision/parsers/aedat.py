@@ -6,7 +6,7 @@ from ..type import DVSSpikeTrain
 _logger = logging.getLogger(__name__)
 
 
-def readAEDATv2_davies(file: str) -> np.recarray:
+def readAEDATv2_davies(file: str, height: int = None) -> np.recarray:
     """
     Parsing is made with the AEDAT 2.0 format for the davies camera
     https://inivation.com/support4/software/fileformat/#aedat-20
@@ -15,6 +15,11 @@ def readAEDATv2_davies(file: str) -> np.recarray:
     Arguments:
         file {str} -- Complete path to file
 
+    Keyword Arguments:
+        height {int} -- Height of the sensor (e.g. 180 for the DAVIS240), used to move the origin
+        from the lower left to the upper left corner. Without it, the highest y of the file is used,
+        which shifts the samples that don't reach the top row. Events with y >= height are dropped (default: {None})
+
     Returns:
         {tuple} -- A tuple of spike data and timestamp.
         The spike data is an array of x, y, and polarity values
@@ -52,11 +57,14 @@ def readAEDATv2_davies(file: str) -> np.recarray:
         _logger.warning("All packets aren't from a DVS Camera (PS or IMU)")
         packets = packets[types == 0]
 
+    y = np.bitwise_and(np.right_shift(packets, 54), 0x1FF)
+    if height is not None and np.any(y >= height):
+        _logger.warning("Events above the sensor height (%i) -- dropping them", height)
+        packets, y = packets[y < height], y[y < height]
+
     data = DVSSpikeTrain(packets.size)
-    data.y = np.bitwise_and(np.right_shift(packets, 54), 0x1FF)
-    data.y = (
-        np.max(data.y) - data.y
-    )  # Lower left to upper left corner coordinate system
+    top = height - 1 if height is not None else np.max(y, initial=0)
+    data.y = top - y  # Lower left to upper left corner coordinate system
     data.x = np.bitwise_and(np.right_shift(packets, 44), 0x3FF)
     data.p = np.bitwise_and(np.right_shift(packets, 42), 0b11)
     data.ts = np.bitwise_and(packets, (1 << 32) - 1)
@@ -116,7 +124,7 @@ def readAEDATv3(file: str) -> np.recarray:
             packet_header["eventSize"] == _AEDATV3_EVENT_DTYPE.itemsize
         ), "Packet size doesn't correspond to underlying datatype"
         assert packet_header["eventType"] == 1  # Polarity events
-        nb_packets = int(packet_header["eventNumber"])
+        nb_packets = int(packet_header["eventNumber"][0])
         packets_data = np.frombuffer(
             data, dtype=_AEDATV3_EVENT_DTYPE, count=nb_packets, offset=offset
         )
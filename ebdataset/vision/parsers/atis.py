@@ -1,30 +1,86 @@
+import os
 import numpy as np
-from ..type import DVSSpikeTrain
+from ..type import DVSSpikeTrain, DVSSpikeTrainBatch
+
+
+def _skip_header(buffer: bytes) -> int:
+    """Position of the first event of an ATIS .dat file"""
+    cursor = 0
+    while buffer.startswith(b"%", cursor):
+        end_of_line = buffer.find(b"\n", cursor)
+        cursor = len(buffer) if end_of_line == -1 else end_of_line + 1
+
+    return cursor + 2  # evType, evSize
 
 
 def readATISFile(filename: str) -> DVSSpikeTrain:
     with open(filename, "rb") as f_hndl:
-        # Skip header
-        while True:
-            cursor = f_hndl.tell()
-            if chr(f_hndl.readline()[0]) != "%":
-                break
+        return readATISBuffer(f_hndl.read())
+
 
-        if cursor >= 0:
-            cursor += 2  # evType, evSize
+def readATISBuffer(buffer) -> DVSSpikeTrain:
+    """Decode the content of an ATIS .dat file (N-Cars) already loaded in memory
 
-        f_hndl.seek(cursor)
+    Arguments:
+        buffer {bytes-like} -- Raw bytes of the file, e.g. a member read from a zip archive
 
-        # Read remaining bytes
-        raw_data = np.fromfile(f_hndl, dtype=np.dtype("<u4"))
+    Returns:
+        DVSSpikeTrain -- The decoded events
+    """
+    if not isinstance(buffer, bytes):
+        buffer = bytes(buffer)
+
+    cursor = _skip_header(buffer)
+
+    # Read remaining bytes
+    nb_words = max(len(buffer) - cursor, 0) // 4
+    raw_data = np.frombuffer(buffer, dtype=np.dtype("<u4"), count=nb_words, offset=min(cursor, len(buffer)))
 
     timestamps = raw_data[0::2]
     positions = raw_data[1::2]
+    timestamps = timestamps[: positions.size]
 
     data = DVSSpikeTrain(timestamps.size)
     data.x = positions & 0x3FFF
     data.y = np.right_shift(positions, 14) & 0x3FFF
-    data.ps = np.right_shift(positions, 28)
+    data.p = np.right_shift(positions, 28)
     data.ts = timestamps
 
     return data
+
+
+def readATISFiles(sources) -> DVSSpikeTrainBatch:
+    """Decode several ATIS .dat files (N-Cars) in a single vectorized pass
+
+    The events of every file are gathered in one buffer after their header and decoded at once,
+    which removes the per-file overhead of readATISFile for small samples.
+
+    Arguments:
+        sources {list} -- Paths of the files or their raw bytes (e.g. members read from a zip archive)
+
+    Returns:
+        DVSSpikeTrainBatch -- The events of every file, the events of file i are in [offsets[i], offsets[i + 1])
+    """
+    payloads = []
+    for source in sources:
+        if isinstance(source, (str, os.PathLike)):
+            with open(os.fspath(source), "rb") as f_hndl:
+                source = f_hndl.read()
+        elif not isinstance(source, bytes):
+            source = bytes(source)
+        cursor = _skip_header(source)
+        nb_events = max(len(source) - cursor, 0) // 8  # Time stamp and position words
+        payloads.append(memoryview(source)[cursor : cursor + 8 * nb_events])
+
+    offsets = np.zeros(len(sources) + 1, dtype=np.int64)
+    np.cumsum([len(payload) // 8 for payload in payloads], out=offsets[1:])
+    raw_data = np.frombuffer(b"".join(payloads), dtype=np.dtype("<u4")).reshape(-1, 2)
+
+    positions = raw_data[:, 1]
+    return DVSSpikeTrainBatch(
+        positions & 0x3FFF,
+        np.right_shift(positions, 14) & 0x3FFF,
+        np.right_shift(positions, 28),
+        raw_data[:, 0],
+        offsets,
+    )
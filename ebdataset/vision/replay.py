@@ -0,0 +1,210 @@
+"""Replay recorded events in real time, e.g. to load-test streaming consumers
+
+Usage: python -m ebdataset.vision.replay --help
+"""
+import os
+import socket
+import struct
+import threading
+import time
+import numpy as np
+from ..utils.units import second, wunits
+from .type import DVSSpikeTrain
+from .parsers.aedat import readAEDATv2_davies, readAEDATv3
+from .parsers.aer import readAERFile
+from .parsers.atis import readATISFile
+
+_SPIN_DURATION = 1e-3  # Busy wait the last millisecond before a packet, time.sleep isn't precise enough
+_LENGTH_PREFIX = struct.Struct("<Q")
+
+
+def read_events(path: str) -> DVSSpikeTrain:
+    """Read a raw event file with the parser matching its header or extension
+
+    Supported formats are AEDAT 3.1 (IBM Gesture), AEDAT 2.0 (INI Roshambo, UCF50),
+    ATIS .dat (Prophesee N-Cars) and AER .bin (N-MNIST, N-Caltech101).
+    """
+    assert os.path.exists(path), "File %s doesn't exist." % path
+    with open(path, "rb") as f:
+        header = f.read(16)
+
+    extension = os.path.splitext(path)[1].lower()
+    if header.startswith(b"#!AER-DAT3"):
+        return readAEDATv3(path)
+    if header.startswith(b"#!AER-DAT2"):
+        return readAEDATv2_davies(path)
+    if header.startswith(b"%") or extension == ".dat":
+        return readATISFile(path)
+    if extension == ".bin":
+        return readAERFile(path)
+    raise ValueError("Unknown event file format for %s" % path)
+
+
+class SocketSink(object):
+    """Send packets to a local socket, a unix socket path or a (host, port) TCP address
+
+    Every packet is sent as its number of bytes (little-endian uint64) followed by the raw
+    DVSSpikeTrain records, which can be read back with np.frombuffer(payload, dtype=DVSSpikeTrain dtype).
+    """
+
+    def __init__(self, address):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.connect(address)
+
+    def __call__(self, packet):
+        payload = np.ascontiguousarray(packet).tobytes()
+        self.socket.sendall(_LENGTH_PREFIX.pack(len(payload)) + payload)
+
+    def close(self):
+        self.socket.close()
+
+
+class ReplayStats(object):
+    """Achieved vs target timing of a replay, every duration is in seconds
+
+    Lateness is the delay between the scheduled and the actual emission time of a packet;
+    jitter is its standard deviation.
+    """
+
+    def __init__(self, nb_events, stream_duration, wall_duration, lateness):
+        self.packets = lateness.size
+        self.events = nb_events
+        self.target_duration = stream_duration
+        self.wall_duration = wall_duration
+        self.target_rate = nb_events / stream_duration if stream_duration > 0 else float("inf")
+        self.achieved_rate = nb_events / wall_duration if wall_duration > 0 else float("inf")
+        self.mean_lateness = float(lateness.mean()) if lateness.size else 0.0
+        self.max_lateness = float(lateness.max()) if lateness.size else 0.0
+        self.jitter = float(lateness.std()) if lateness.size else 0.0
+
+    def __repr__(self):
+        return (
+            "%i packets, %i events in %.3fs (target %.3fs): %.0f ev/s achieved, %.0f ev/s target, "
+            "lateness mean %.1fus max %.1fus, jitter %.1fus"
+            % (
+                self.packets,
+                self.events,
+                self.wall_duration,
+                self.target_duration,
+                self.achieved_rate,
+                self.target_rate,
+                self.mean_lateness * 1e6,
+                self.max_lateness * 1e6,
+                self.jitter * 1e6,
+            )
+        )
+
+
+class Replayer(object):
+    """Emit the events of a recording as packets on a wall-clock schedule
+
+    Packets either cover a fixed duration of the recording (packet_duration), empty packets included,
+    or hold a fixed number of events (packet_size). A packet is emitted when the recording reaches its end,
+    as a sensor would, sped up or slowed down by speed.
+
+    The sink receives each packet as a DVSSpikeTrain and can be a callable, a queue (anything with a put method)
+    or a SocketSink.
+
+    Usage:
+        replayer = Replayer("user01_fluorescent.aedat", my_callback, packet_duration=10 * ms, speed=2)
+        stats = replayer.run()
+    """
+
+    @wunits(None, (None, None, None, second, None, None, None), False)
+    def __init__(self, source, sink, packet_duration=None, packet_size=None, speed=1.0, time_scale=None):
+        """
+        Arguments:
+            source -- DVSSpikeTrain or path of a raw event file (see read_events)
+            sink -- Callable, queue or SocketSink receiving the packets
+
+        Keyword Arguments:
+            packet_duration -- Duration of the recording covered by a packet (default: {None})
+            packet_size {int} -- Number of events per packet, used when packet_duration isn't set (default: {None})
+            speed {float} -- Playback speed multiplier (default: {1.0})
+            time_scale {float} -- Duration of a timestamp unit in seconds, overrides the one of the source
+            (default: {None})
+        """
+        assert (packet_duration is None) != (packet_size is None), "Set either packet_duration or packet_size"
+        assert speed > 0, "Speed must be positive"
+        spike_train = read_events(source) if isinstance(source, str) else source
+        if np.any(np.diff(spike_train.ts.astype(np.int64)) < 0):
+            spike_train = spike_train[np.argsort(spike_train.ts, kind="stable")]
+
+        self.spike_train = spike_train
+        self.sink = sink.put if hasattr(sink, "put") else sink
+        self.speed = speed
+        self.time_scale = time_scale or getattr(spike_train, "time_scale", None) or 1e-6
+        self._stop = threading.Event()
+
+        ts = spike_train.ts.astype(np.int64)
+        t0 = int(ts[0]) if ts.size else 0
+        if packet_duration is not None:
+            step = max(int(round(packet_duration / self.time_scale)), 1)
+            nb_packets = (int(ts[-1]) - t0) // step + 1 if ts.size else 0
+            packet_ends = t0 + step * np.arange(1, nb_packets + 1)
+            self._boundaries = np.concatenate(([0], np.searchsorted(ts, packet_ends, side="left")))
+            self._emit_ts = packet_ends - t0
+        else:
+            assert packet_size > 0, "Packet size must be positive"
+            self._boundaries = np.append(np.arange(0, ts.size, packet_size), ts.size)
+            self._emit_ts = ts[self._boundaries[1:] - 1] - t0
+
+    def __len__(self):
+        return len(self._emit_ts)
+
+    def stop(self):
+        """Stop a replay running in another thread"""
+        self._stop.set()
+
+    def run(self) -> ReplayStats:
+        """Replay every packet, blocking until the end of the recording or stop
+
+        Returns:
+            ReplayStats -- Achieved vs target rate and lateness of the packets
+        """
+        self._stop.clear()
+        schedule = self._emit_ts * (self.time_scale / self.speed)
+        lateness = np.zeros(len(schedule))
+        nb_events = 0
+
+        start = time.perf_counter()
+        for i, target in enumerate(schedule):
+            if self._stop.is_set():
+                lateness = lateness[:i]
+                break
+            remaining = start + target - time.perf_counter()
+            if remaining > _SPIN_DURATION:
+                time.sleep(remaining - _SPIN_DURATION)
+            while time.perf_counter() < start + target:
+                pass
+            lateness[i] = time.perf_counter() - start - target
+            packet = self.spike_train[self._boundaries[i] : self._boundaries[i + 1]]
+            self.sink(packet)
+            nb_events += len(packet)
+        wall_duration = time.perf_counter() - start
+
+        stream_duration = float(schedule[len(lateness) - 1]) if len(lateness) else 0.0
+        return ReplayStats(nb_events, stream_duration, wall_duration, lateness)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay an event file in real time and report the achieved timing")
+    parser.add_argument("path", help="Raw event file (.aedat, .dat or .bin)")
+    parser.add_argument("-d", "--packet_duration", type=float, default=None, help="Packet duration in milliseconds")
+    parser.add_argument("-n", "--packet_size", type=int, default=None, help="Number of events per packet")
+    parser.add_argument("-s", "--speed", type=float, default=1.0, help="Playback speed multiplier")
+    parser.add_argument("--socket", default=None, help="Send packets to a unix socket path or host:port")
+    args = parser.parse_args()
+
+    sink = lambda packet: None
+    if args.socket is not None:
+        host, _, port = args.socket.rpartition(":")
+        sink = SocketSink((host, int(port)) if port.isdigit() and host else args.socket)
+
+    packet_duration = args.packet_duration * 1e-3 if args.packet_duration is not None else None
+    if packet_duration is None and args.packet_size is None:
+        packet_duration = 10e-3
+    print(Replayer(args.path, sink, packet_duration, args.packet_size, args.speed).run())
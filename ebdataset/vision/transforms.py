@@ -1,23 +1,66 @@
 """
 Torchvision-like transforms for 2d sparse rec-array spike trains
 """
+import functools
+import os
 import torch
 import numpy as np
 from ..utils.units import second, us, ms, wunits
 from torchvision.transforms import Compose
+from .type import DVSSpikeTrainBatch
+
+
+@functools.lru_cache(maxsize=64)
+def _axis_lut(source: int, target: int, factor: int = None) -> np.ndarray:
+    """Read-only lookup table mapping the coordinates of a sensor axis of size source to an axis of size target,
+    by pooling factor consecutive pixels or, without factor, by nearest neighbour resizing"""
+    coordinates = np.arange(source, dtype=np.int64)
+    lut = coordinates // factor if factor is not None else coordinates * target // source
+    lut = lut.astype(np.uint16)
+    lut.setflags(write=False)
+    return lut
+
+
+def _sensor_size(sparse_spike_train) -> tuple:
+    width = getattr(sparse_spike_train, "width", None)
+    height = getattr(sparse_spike_train, "height", None)
+    assert width is not None and width > 0 and height is not None and height > 0, "Unknown sensor size"
+    return width, height
+
+
+def _inside(sparse_spike_train, width: int, height: int):
+    """Events of the spike train inside the width x height sensor, the spike train itself when they all are"""
+    inside = (sparse_spike_train.x < width) & (sparse_spike_train.y < height)
+    return sparse_spike_train if inside.all() else sparse_spike_train[inside]
+
+
+def _remap(sparse_spike_train, x, y, width, height, mask=None):
+    """Copy of the spike train with new coordinates and sensor size, keeping the events selected by mask"""
+    out = sparse_spike_train[mask] if mask is not None else sparse_spike_train.copy()
+    out.x = x[mask] if mask is not None else x
+    out.y = y[mask] if mask is not None else y
+    out.width, out.height = width, height
+    return out
 
 
 class ScaleDown(object):
-    """Scale down a 2d sparse spike train by factor (both in x and y)"""
+    """Scale down a 2d sparse spike train by factor (both in x and y)
+    Only the events of one pixel out of factor in each direction are kept, see Downsample to keep them all"""
 
     def __init__(self, width, height, factor):
-        self.authorized_x = list(range(0, width, factor))
-        self.authorized_y = list(range(0, height, factor))
+        self.authorized_x = np.zeros(width, dtype=bool)
+        self.authorized_x[::factor] = True
+        self.authorized_y = np.zeros(height, dtype=bool)
+        self.authorized_y[::factor] = True
         self.factor = factor
 
     def __call__(self, sparse_spike_train):
-        x_mask = np.isin(sparse_spike_train.x, self.authorized_x)
-        y_mask = np.isin(sparse_spike_train.y, self.authorized_y)
+        x_mask = np.zeros(sparse_spike_train.x.shape, dtype=bool)
+        y_mask = np.zeros(sparse_spike_train.y.shape, dtype=bool)
+        in_x = sparse_spike_train.x < self.authorized_x.size
+        in_y = sparse_spike_train.y < self.authorized_y.size
+        x_mask[in_x] = self.authorized_x[sparse_spike_train.x[in_x]]
+        y_mask[in_y] = self.authorized_y[sparse_spike_train.y[in_y]]
         mask = x_mask & y_mask
 
         out = np.recarray(np.sum(mask), dtype=sparse_spike_train.dtype)
@@ -29,6 +72,132 @@ class ScaleDown(object):
         return out
 
 
+class Resize(object):
+    """Resize a 2d sparse spike train to width x height with nearest neighbour lookup tables
+
+    Every event is kept: several source pixels map to the same pixel when shrinking, some pixels stay
+    silent when enlarging. The source size is read from the width and height of each spike train,
+    so samples of different sensors can be resized to a common resolution. Events outside the source
+    sensor are dropped, like in ScaleDown.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+
+    def __call__(self, sparse_spike_train):
+        source_width, source_height = _sensor_size(sparse_spike_train)
+        sparse_spike_train = _inside(sparse_spike_train, source_width, source_height)
+        x = _axis_lut(source_width, self.width)[sparse_spike_train.x]
+        y = _axis_lut(source_height, self.height)[sparse_spike_train.y]
+        return _remap(sparse_spike_train, x, y, self.width, self.height)
+
+
+class Downsample(object):
+    """Downsample a 2d sparse spike train by pooling factor x factor pixels, keeping every event inside the sensor
+    The sensor size becomes ceil(width / factor) x ceil(height / factor)"""
+
+    def __init__(self, factor: int):
+        self.factor = factor
+
+    def __call__(self, sparse_spike_train):
+        width, height = _sensor_size(sparse_spike_train)
+        target_width, target_height = -(-width // self.factor), -(-height // self.factor)
+        sparse_spike_train = _inside(sparse_spike_train, width, height)
+        x = _axis_lut(width, target_width, self.factor)[sparse_spike_train.x]
+        y = _axis_lut(height, target_height, self.factor)[sparse_spike_train.y]
+        return _remap(sparse_spike_train, x, y, target_width, target_height)
+
+
+class _RandomTransform(object):
+    """Transform drawing from its own generator, created in every process on first use so that DataLoader workers
+    don't all draw the same sequence. With a seed, the generator of a worker is seeded by (seed, worker id) and the
+    draws are reproducible, otherwise by the torch seed of the worker."""
+
+    _volatile_attributes = ("_rand", "_pid")  # State of the generator, ignored by utils.cache.transform_hash
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self._rand = None
+        self._pid = None
+
+    @property
+    def rand(self) -> np.random.RandomState:
+        if self._rand is None or self._pid != os.getpid():
+            worker_info = torch.utils.data.get_worker_info()
+            if worker_info is None:
+                seed = self.seed
+            elif self.seed is None:
+                seed = worker_info.seed % 2 ** 32
+            else:
+                seed = [self.seed, worker_info.id]
+            self._rand = np.random.RandomState(seed=seed)
+            self._pid = os.getpid()
+        return self._rand
+
+
+class _Crop(object):
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+
+    def _crop(self, sparse_spike_train, x0: int, y0: int):
+        x = sparse_spike_train.x.astype(np.int64) - x0
+        y = sparse_spike_train.y.astype(np.int64) - y0
+        mask = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        return _remap(sparse_spike_train, x, y, self.width, self.height, mask)
+
+
+class CenterCrop(_Crop):
+    """Crop the center width x height pixels of a 2d sparse spike train"""
+
+    def __call__(self, sparse_spike_train):
+        width, height = _sensor_size(sparse_spike_train)
+        assert self.width <= width and self.height <= height, "Crop is larger than the sensor"
+        return self._crop(sparse_spike_train, (width - self.width) // 2, (height - self.height) // 2)
+
+
+class RandomCrop(_Crop, _RandomTransform):
+    """Crop width x height pixels of a 2d sparse spike train at a random position"""
+
+    def __init__(self, width: int, height: int, seed=None):
+        _Crop.__init__(self, width, height)
+        _RandomTransform.__init__(self, seed)
+
+    def __call__(self, sparse_spike_train):
+        width, height = _sensor_size(sparse_spike_train)
+        assert self.width <= width and self.height <= height, "Crop is larger than the sensor"
+        x0 = self.rand.randint(0, width - self.width + 1)
+        y0 = self.rand.randint(0, height - self.height + 1)
+        return self._crop(sparse_spike_train, x0, y0)
+
+
+class ROIMask(object):
+    """Keep the events of a 2d sparse spike train falling in a region of interest, the sensor size is unchanged"""
+
+    def __init__(self, mask):
+        """
+        Arguments:
+            mask {np.ndarray} -- Boolean array of shape (width, height), True for the pixels to keep
+        """
+        self.mask = np.asarray(mask, dtype=bool)
+
+    @classmethod
+    def box(cls, width: int, height: int, x: int, y: int, box_width: int, box_height: int):
+        """Rectangular region of interest of box_width x box_height pixels starting at (x, y)"""
+        mask = np.zeros((width, height), dtype=bool)
+        mask[x : x + box_width, y : y + box_height] = True
+        return cls(mask)
+
+    def __call__(self, sparse_spike_train):
+        x = sparse_spike_train.x
+        y = sparse_spike_train.y
+        inside = (x < self.mask.shape[0]) & (y < self.mask.shape[1])
+        keep = np.zeros(x.shape, dtype=bool)
+        keep[inside] = self.mask[x[inside], y[inside]]
+        return sparse_spike_train[keep]
+
+
 class MaxTime(object):
     """Limit the time of a 2d sparse spike train"""
 
@@ -77,3 +246,258 @@ class Flatten(object):
 
     def __call__(self, dense_spike_train):
         return dense_spike_train.reshape(-1, dense_spike_train.shape[-1])
+
+
+class BatchToDense(object):
+    """Transform a DVSSpikeTrainBatch to a dense torch tensor of shape (batch, x, y, p, time)
+    with time unit defined by dt, padded to the longest sample. Time accumulation is done with a max function.
+
+    Meant to run in the main process on batches collated with collate_spike_trains, so that workers
+    only send compact events. With sparse=True, a coalesced torch.sparse_coo tensor is returned instead.
+    """
+
+    @wunits(None, (None, second, None))
+    def __init__(
+        self,
+        dt,  # Time scale of dense tensor
+        sparse=False,
+    ):
+        self.dt = dt
+        self.sparse = sparse
+
+    def __call__(self, batch):
+        time_scale = batch.time_scale / self.dt
+        duration = int(np.ceil(np.max(batch.durations, initial=0) * time_scale))
+        size = (len(batch), batch.width, batch.height, 2, duration)
+
+        indices = torch.from_numpy(
+            np.stack(
+                (
+                    batch.batch_index,
+                    batch.x.astype(np.int64),
+                    batch.y.astype(np.int64),
+                    batch.p.astype(np.int64),
+                    (batch.ts * time_scale).astype(np.int64),
+                )
+            )
+        )
+
+        if self.sparse:
+            spike_train = torch.sparse_coo_tensor(indices, torch.ones(indices.shape[1]), size).coalesce()
+            return torch.sparse_coo_tensor(spike_train.indices(), spike_train.values().clamp_(max=1), size).coalesce()
+
+        dense_spike_train = torch.zeros(size)
+        dense_spike_train[tuple(indices)] = 1
+        return dense_spike_train
+
+
+class _EventFilter(object):
+    """Keep track of the number of events seen and dropped by a filter (per process when used in workers)"""
+
+    events_in = 0
+    events_dropped = 0
+    _volatile_attributes = ("events_in", "events_dropped")  # Not parameters, ignored by utils.cache.transform_hash
+
+    @property
+    def drop_ratio(self) -> float:
+        return self.events_dropped / max(self.events_in, 1)
+
+    def reset_counts(self):
+        self.events_in = 0
+        self.events_dropped = 0
+
+    def _filter(self, sparse_spike_train, mask):
+        self.events_in += mask.size
+        self.events_dropped += mask.size - np.count_nonzero(mask)
+        return sparse_spike_train[mask]
+
+
+class BackgroundActivityFilter(_EventFilter):
+    """Remove background activity noise from a 2d sparse spike train
+
+    An event is kept if one of the 8 neighbouring pixels had an event in the preceding dt window.
+    Each neighbour is looked up with a single vectorized binary search over the events sorted by (pixel, time).
+    The number of events seen and dropped is accumulated in events_in and events_dropped.
+    """
+
+    @wunits(None, (None, second, second))
+    def __init__(self, dt, time_scale=1 * us):
+        self.dt = int(dt / time_scale)
+
+    def __call__(self, sparse_spike_train):
+        if len(sparse_spike_train) == 0:
+            return self._filter(sparse_spike_train, np.ones(0, dtype=bool))
+
+        ts = sparse_spike_train.ts.astype(np.int64)
+        ts -= ts.min()
+        span = int(ts.max()) + 1
+        height = int(sparse_spike_train.y.max()) + 3  # Padding so that neighbours never wrap around
+        x = sparse_spike_train.x.astype(np.int64) + 1
+        y = sparse_spike_train.y.astype(np.int64) + 1
+        assert (int(x.max()) + 2) * height * span < 2 ** 63, "Spike train too long to be filtered at once"
+
+        keys = (x * height + y) * span + ts
+        sorted_keys = np.sort(keys)
+
+        supported = np.zeros(keys.size, dtype=bool)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                if dx == 0 and dy == 0:
+                    continue
+                neighbour = ((x + dx) * height + (y + dy)) * span
+                # Latest event of the neighbour pixel at or before the event
+                latest = np.searchsorted(sorted_keys, neighbour + ts, side="right") - 1
+                found = sorted_keys[np.maximum(latest, 0)]
+                supported |= (latest >= 0) & (found >= neighbour) & (found >= neighbour + ts - self.dt)
+
+        return self._filter(sparse_spike_train, supported)
+
+
+class RefractoryFilter(_EventFilter):
+    """Apply a refractory period to every pixel of a 2d sparse spike train
+
+    An event is dropped if the last kept event of the same pixel and polarity happened less than period ago.
+    All the pixels advance together: every pass keeps the next event of each pixel with one vectorized
+    binary search, so the number of passes is bounded by the number of kept events of the busiest pixel.
+    The number of events seen and dropped is accumulated in events_in and events_dropped.
+    """
+
+    @wunits(None, (None, second, second))
+    def __init__(self, period, time_scale=1 * us):
+        self.period = int(period / time_scale)
+
+    def __call__(self, sparse_spike_train):
+        if len(sparse_spike_train) == 0:
+            return self._filter(sparse_spike_train, np.ones(0, dtype=bool))
+
+        ts = sparse_spike_train.ts.astype(np.int64)
+        ts -= ts.min()
+        span = int(ts.max()) + self.period + 1  # A pixel's refractory period never reaches the next pixel
+        height = int(sparse_spike_train.y.max()) + 1
+        pixels = (sparse_spike_train.x.astype(np.int64) * height + sparse_spike_train.y) * 2 + sparse_spike_train.p
+        assert (int(pixels.max()) + 1) * span < 2 ** 63, "Spike train too long to be filtered at once"
+
+        keys = pixels * span + ts
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        group_starts = np.flatnonzero(np.r_[True, np.diff(pixels[order]) != 0])
+        group_ends = np.r_[group_starts[1:], keys.size]
+
+        kept = np.zeros(keys.size, dtype=bool)
+        current = group_starts
+        while current.size > 0:
+            kept[order[current]] = True
+            following = np.searchsorted(sorted_keys, sorted_keys[current] + self.period, side="left")
+            in_group = following < group_ends
+            current, group_ends = following[in_group], group_ends[in_group]
+
+        return self._filter(sparse_spike_train, kept)
+
+
+def _replace_events(batch, mask=None, x=None, y=None, ts=None, durations=None, width=None, height=None):
+    """New DVSSpikeTrainBatch with the given columns replaced and only the events selected by mask
+    The input batch is left untouched, columns are cast back to the event dtypes"""
+    x = batch.x if x is None else x
+    y = batch.y if y is None else y
+    p = batch.p
+    ts = batch.ts if ts is None else ts
+    offsets = batch.offsets
+    if mask is not None:
+        x, y, p, ts = x[mask], y[mask], p[mask], ts[mask]
+        offsets = np.zeros(len(batch) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(batch.batch_index[mask], minlength=len(batch)), out=offsets[1:])
+    return DVSSpikeTrainBatch(
+        x,
+        y,
+        p,
+        ts,
+        offsets,
+        width=batch.width if width is None else width,
+        height=batch.height if height is None else height,
+        durations=batch.durations if durations is None else durations,
+        time_scale=batch.time_scale,
+    )
+
+
+class _BatchAugmentation(_RandomTransform):
+    """Augmentation of a DVSSpikeTrainBatch drawing its random parameters from its own seeded generator,
+    one per DataLoader worker when batches are augmented in the collate_fn of the workers"""
+
+
+class BatchRandomFlip(_BatchAugmentation):
+    """Flip each sample of a DVSSpikeTrainBatch horizontally with probability p_x and vertically with probability p_y"""
+
+    def __init__(self, p_x=0.5, p_y=0.0, seed=None):
+        super().__init__(seed)
+        self.p_x = p_x
+        self.p_y = p_y
+
+    def __call__(self, batch):
+        batch_index = batch.batch_index
+        flip_x = (self.rand.random_sample(len(batch)) < self.p_x)[batch_index]
+        flip_y = (self.rand.random_sample(len(batch)) < self.p_y)[batch_index]
+        x = np.where(flip_x, batch.width - 1 - batch.x.astype(np.int64), batch.x)
+        y = np.where(flip_y, batch.height - 1 - batch.y.astype(np.int64), batch.y)
+        return _replace_events(batch, x=x, y=y)
+
+
+class BatchRandomCrop(_BatchAugmentation):
+    """Crop each sample of a DVSSpikeTrainBatch to width x height at a random position"""
+
+    def __init__(self, width, height, seed=None):
+        super().__init__(seed)
+        self.width = width
+        self.height = height
+
+    def __call__(self, batch):
+        assert self.width <= batch.width and self.height <= batch.height, "Crop is larger than the samples"
+        batch_index = batch.batch_index
+        x0 = self.rand.randint(0, batch.width - self.width + 1, size=len(batch))[batch_index]
+        y0 = self.rand.randint(0, batch.height - self.height + 1, size=len(batch))[batch_index]
+        x = batch.x.astype(np.int64) - x0
+        y = batch.y.astype(np.int64) - y0
+        mask = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        return _replace_events(batch, mask, x=x, y=y, width=self.width, height=self.height)
+
+
+class BatchSpatialJitter(_BatchAugmentation):
+    """Move every event of a DVSSpikeTrainBatch by a rounded gaussian offset of standard deviation sigma (pixels)
+    Events jittered outside of the sensor are dropped"""
+
+    def __init__(self, sigma=1.0, seed=None):
+        super().__init__(seed)
+        self.sigma = sigma
+
+    def __call__(self, batch):
+        x = batch.x + np.rint(self.rand.normal(scale=self.sigma, size=batch.x.size)).astype(np.int64)
+        y = batch.y + np.rint(self.rand.normal(scale=self.sigma, size=batch.y.size)).astype(np.int64)
+        mask = (x >= 0) & (x < batch.width) & (y >= 0) & (y < batch.height)
+        return _replace_events(batch, mask, x=x, y=y)
+
+
+class BatchTimeStretch(_BatchAugmentation):
+    """Scale the timestamps of each sample of a DVSSpikeTrainBatch by a factor drawn uniformly in [low, high]"""
+
+    def __init__(self, low=0.8, high=1.2, seed=None):
+        super().__init__(seed)
+        self.low = low
+        self.high = high
+
+    def __call__(self, batch):
+        factors = self.rand.uniform(self.low, self.high, size=len(batch))
+        ts = batch.ts * factors[batch.batch_index]
+        return _replace_events(batch, ts=ts, durations=np.ceil(batch.durations * factors).astype(np.int64))
+
+
+class BatchEventDrop(_BatchAugmentation):
+    """Drop a random ratio of the events of each sample of a DVSSpikeTrainBatch, drawn uniformly in [0, max_ratio]"""
+
+    def __init__(self, max_ratio=0.1, seed=None):
+        super().__init__(seed)
+        self.max_ratio = max_ratio
+
+    def __call__(self, batch):
+        ratios = self.rand.uniform(0, self.max_ratio, size=len(batch))
+        mask = self.rand.random_sample(batch.ts.size) >= ratios[batch.batch_index]
+        return _replace_events(batch, mask)
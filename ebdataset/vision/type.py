@@ -1,6 +1,7 @@
 import numpy as np
 
 _dtype = np.dtype([("x", np.uint16), ("y", np.uint16), ("p", np.bool_), ("ts", np.uint64)])
+_ATTRIBUTES = ("width", "height", "duration", "time_scale")
 
 
 class DVSSpikeTrain(np.recarray):
@@ -25,3 +26,105 @@ class DVSSpikeTrain(np.recarray):
         self.height = getattr(obj, "height", None)
         self.duration = getattr(obj, "duration", None)
         self.time_scale = getattr(obj, "time_scale", None)
+
+    def __reduce__(self):  # Keep the attributes when sent to other processes (DataLoader workers, pipelines)
+        reconstruct, arguments, state = super(DVSSpikeTrain, self).__reduce__()
+        attributes = {name: getattr(self, name, None) for name in _ATTRIBUTES}
+        return reconstruct, arguments, (state, attributes)
+
+    def __setstate__(self, state):
+        state, attributes = state
+        super(DVSSpikeTrain, self).__setstate__(state)
+        for name, value in attributes.items():
+            setattr(self, name, value)
+
+
+class DVSSpikeTrainBatch(object):
+    """Events of several DVSSpikeTrain packed into contiguous x, y, p and ts columns
+
+    The events of sample i are found in [offsets[i], offsets[i + 1]) of the columns.
+    Batches are cheap to send between processes and can be transformed with a handful of array operations.
+    """
+
+    def __init__(self, x, y, p, ts, offsets, width=-1, height=-1, durations=None, time_scale=1e-6):
+        self.x = np.ascontiguousarray(x, dtype=_dtype["x"])
+        self.y = np.ascontiguousarray(y, dtype=_dtype["y"])
+        self.p = np.ascontiguousarray(p, dtype=_dtype["p"])
+        self.ts = np.ascontiguousarray(ts, dtype=_dtype["ts"])
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.width = width
+        self.height = height
+        self.time_scale = time_scale
+
+        if durations is None:  # Infer the duration of each sample from its last event
+            durations = np.zeros(len(self), dtype=np.int64)
+            not_empty = self.counts > 0
+            durations[not_empty] = np.maximum.reduceat(self.ts, self.offsets[:-1][not_empty]) + 1
+        self.durations = np.asarray(durations)
+
+    @classmethod
+    def from_spike_trains(cls, spike_trains):
+        """Pack a sequence of DVSSpikeTrain in a single batch"""
+        offsets = np.zeros(len(spike_trains) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(spike_train) for spike_train in spike_trains])
+        events = np.concatenate([np.asarray(spike_train).view(np.ndarray) for spike_train in spike_trains])
+
+        durations = np.asarray([getattr(spike_train, "duration", -1) or -1 for spike_train in spike_trains])
+        for i in np.flatnonzero(durations < 0):
+            durations[i] = spike_trains[i].ts.max() + 1 if len(spike_trains[i]) > 0 else 0
+
+        time_scales = {getattr(spike_train, "time_scale", 1e-6) for spike_train in spike_trains}
+        assert len(time_scales) <= 1, "All the samples of a batch must share the same time scale"
+
+        return cls(
+            events["x"],
+            events["y"],
+            events["p"],
+            events["ts"],
+            offsets,
+            width=max([getattr(spike_train, "width", -1) or -1 for spike_train in spike_trains], default=-1),
+            height=max([getattr(spike_train, "height", -1) or -1 for spike_train in spike_trains], default=-1),
+            durations=durations,
+            time_scale=time_scales.pop() if time_scales else 1e-6,
+        )
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Number of events of each sample"""
+        return np.diff(self.offsets)
+
+    @property
+    def batch_index(self) -> np.ndarray:
+        """Sample index of every event"""
+        return np.repeat(np.arange(len(self)), self.counts)
+
+    def __len__(self):
+        return self.offsets.size - 1
+
+    def __getitem__(self, index) -> DVSSpikeTrain:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        spike_train = DVSSpikeTrain(
+            end - start,
+            width=self.width,
+            height=self.height,
+            duration=self.durations[index],
+            time_scale=self.time_scale,
+        )
+        spike_train.x = self.x[start:end]
+        spike_train.y = self.y[start:end]
+        spike_train.p = self.p[start:end]
+        spike_train.ts = self.ts[start:end]
+        return spike_train
+
+
+def collate_spike_trains(batch):
+    """DataLoader collate_fn packing the sparse spike trains of a batch of (spike train, label)
+    into a DVSSpikeTrainBatch, the labels are collated with the default PyTorch collate_fn"""
+    from torch.utils.data.dataloader import default_collate
+
+    spike_trains, labels = zip(*batch)
+    try:
+        labels = default_collate(labels)
+    except TypeError:  # Labels PyTorch doesn't know how to collate
+        labels = list(labels)
+    return DVSSpikeTrainBatch.from_spike_trains(spike_trains), labels
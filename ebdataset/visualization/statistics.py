@@ -0,0 +1,315 @@
+"""Dataset-wide event statistics: event rate over time, per-label durations and event counts, pixel activity
+
+Every sample is streamed through a process pool, each worker accumulates histograms with np.bincount
+and the partial results are merged, so memory doesn't depend on the size of the dataset.
+
+Usage: python -m ebdataset.visualization.statistics --help
+"""
+import inspect
+import json
+import os
+import numpy as np
+from ..utils.parallel import bounded_map
+
+_CHUNK_SIZE = 64
+
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _grown(total, shape):
+    """total zero padded to at least shape, total itself when it is already large enough"""
+    if total is not None and all(a >= b for a, b in zip(total.shape, shape)):
+        return total
+    grown = np.zeros(shape if total is None else tuple(max(a, b) for a, b in zip(total.shape, shape)), dtype=np.int64)
+    if total is not None:
+        grown[tuple(slice(0, n) for n in total.shape)] = total
+    return grown
+
+
+def _add_padded(total, counts):
+    """Add counts to total in place, total being padded first when counts is larger along any dimension"""
+    total = _grown(total, counts.shape)
+    total[tuple(slice(0, n) for n in counts.shape)] += counts
+    return total
+
+
+def _describe(values) -> dict:
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(values.size),
+        "min": float(values.min()),
+        "mean": float(values.mean()),
+        "median": float(np.median(values)),
+        "p95": float(np.percentile(values, 95)),
+        "max": float(values.max()),
+    }
+
+
+class DatasetStatistics(object):
+    """Mergeable statistics of the samples of a dataset
+
+    Attributes:
+        labels, events, durations -- Label, number of events and duration (s) of every sample
+        time_histogram -- Number of events per time bin of bin_size seconds since the start of the samples
+        coverage -- Number of samples lasting up to each time bin, time_histogram / coverage is the mean rate per bin
+        pixel_counts -- Number of events per pixel (x, y), or per address for 1d samples (e.g. NTidigits)
+        on_counts -- Number of ON events per pixel, None for samples without polarity
+    """
+
+    def __init__(self, bin_size: float = 1e-3):
+        """
+        Keyword Arguments:
+            bin_size {float} -- Duration of the bins of the event rate histogram in seconds (default: {1e-3})
+        """
+        self.bin_size = bin_size
+        self.labels = []
+        self._events = []
+        self._durations = []
+        self._nb_bins = []  # Number of time bins of every sample, the coverage is derived from them
+        self.time_histogram = np.zeros(0, dtype=np.int64)
+        self.pixel_counts = None
+        self.on_counts = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def events(self) -> np.ndarray:
+        return np.asarray(self._events, dtype=np.int64)
+
+    @property
+    def durations(self) -> np.ndarray:
+        return np.asarray(self._durations, dtype=np.float64)
+
+    @property
+    def coverage(self) -> np.ndarray:
+        samples_per_length = np.bincount(np.asarray(self._nb_bins, dtype=np.int64), minlength=1)
+        return np.cumsum(samples_per_length[::-1])[::-1][1:]  # Samples with more bins than each index
+
+    def add(self, spike_train, label):
+        """Accumulate the statistics of a sample"""
+        names = spike_train.dtype.names
+        time_scale = getattr(spike_train, "time_scale", None) or 1
+        count = len(spike_train)
+        duration = getattr(spike_train, "duration", None)
+        if duration is None or duration < 0:
+            duration = spike_train.ts.max() + 1 if count > 0 else 0
+        duration = float(duration) * time_scale
+
+        self.labels.append(_to_python(label))
+        self._events.append(count)
+        self._durations.append(duration)
+
+        bins = (spike_train.ts * (time_scale / self.bin_size)).astype(np.int64)
+        nb_bins = max(int(np.ceil(duration / self.bin_size)), int(bins.max()) + 1 if count > 0 else 0)
+        self._nb_bins.append(nb_bins)
+        self.time_histogram = _add_padded(self.time_histogram, np.bincount(bins, minlength=nb_bins))
+
+        if "x" in names and "y" in names:
+            width = max(getattr(spike_train, "width", None) or 0, int(spike_train.x.max()) + 1 if count > 0 else 0)
+            height = max(getattr(spike_train, "height", None) or 0, int(spike_train.y.max()) + 1 if count > 0 else 0)
+            shape = (width, height)
+        elif "addr" in names:
+            shape = (int(spike_train.addr.max()) + 1 if count > 0 else 0,)
+        else:
+            return
+
+        # Events are counted straight into the totals, which only grow when a sample is larger than the previous ones
+        self.pixel_counts = _grown(self.pixel_counts, shape)
+        if len(shape) == 2:
+            pixels = spike_train.x.astype(np.int64) * self.pixel_counts.shape[1] + spike_train.y
+        else:
+            pixels = spike_train.addr.astype(np.int64)
+        counts = np.bincount(pixels)
+        self.pixel_counts.reshape(-1)[: counts.size] += counts
+        if "p" in names:
+            self.on_counts = _grown(self.on_counts, self.pixel_counts.shape)
+            on_counts = np.bincount(pixels, weights=spike_train.p).astype(np.int64)
+            self.on_counts.reshape(-1)[: on_counts.size] += on_counts
+
+    def merge(self, other):
+        """Add the statistics of other, computed with the same bin_size, to these ones"""
+        assert other.bin_size == self.bin_size, "Can't merge statistics with different bin sizes"
+        self.labels += other.labels
+        self._events += other._events
+        self._durations += other._durations
+        self._nb_bins += other._nb_bins
+        self.time_histogram = _add_padded(self.time_histogram, other.time_histogram)
+        for name in ("pixel_counts", "on_counts"):
+            if getattr(other, name) is not None:
+                setattr(self, name, _add_padded(getattr(self, name), getattr(other, name)))
+        return self
+
+    @classmethod
+    def compute(cls, dataset, indices=None, bin_size: float = 1e-3, num_workers: int = 0, verbose: bool = True):
+        """Statistics of the samples of a dataset, read without the dataset transforms
+
+        Arguments:
+            dataset -- Map-style dataset returning (sparse spike train, label) tuples
+
+        Keyword Arguments:
+            indices {array-like} -- Subset of samples to use, every sample by default (default: {None})
+            bin_size {float} -- Duration of the bins of the event rate histogram in seconds (default: {1e-3})
+            num_workers {int} -- Number of processes reading the samples (default: {0})
+            verbose {bool} -- Show a progress bar (default: {True})
+        """
+        from tqdm import tqdm
+
+        indices = np.arange(len(dataset)) if indices is None else np.asarray(indices)
+        chunks = [indices[start : start + _CHUNK_SIZE] for start in range(0, indices.size, _CHUNK_SIZE)]
+        statistics = cls(bin_size)
+        transforms = getattr(dataset, "transforms", None)
+        try:
+            if transforms is not None:
+                dataset.transforms = None
+            with tqdm(total=indices.size, desc="Computing statistics", disable=not verbose) as progress:
+                jobs = ((dataset, chunk, bin_size) for chunk in chunks)
+                for partial in bounded_map(_chunk_statistics, jobs, num_workers):
+                    statistics.merge(partial)
+                    progress.update(len(partial))
+        finally:
+            if transforms is not None:
+                dataset.transforms = transforms
+        return statistics
+
+    @property
+    def mean_rate(self) -> np.ndarray:
+        """Mean event rate (events/s) of the samples lasting up to each time bin"""
+        return self.time_histogram / np.maximum(self.coverage, 1) / self.bin_size
+
+    def summary(self) -> dict:
+        """Overall and per-label distributions of the durations and event counts"""
+        labels = np.asarray([str(label) for label in self.labels])
+        per_label = {}
+        for label in sorted(set(labels.tolist())):
+            mask = labels == label
+            per_label[label] = {"duration_s": _describe(self.durations[mask]), "events": _describe(self.events[mask])}
+        return {
+            "samples": len(self),
+            "total_events": int(self.events.sum()),
+            "bin_size_s": self.bin_size,
+            "duration_s": _describe(self.durations),
+            "events": _describe(self.events),
+            "event_rate_per_s": _describe(self.events / np.maximum(self.durations, np.finfo(np.float64).tiny)),
+            "labels": per_label,
+        }
+
+    def save(self, directory: str, plot: bool = True):
+        """Write the report: summary.json, the histograms in statistics.npz and, with matplotlib, figures
+
+        Arguments:
+            directory {str} -- Output directory, created if needed
+
+        Keyword Arguments:
+            plot {bool} -- Save figures of the histograms when matplotlib is available (default: {True})
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "summary.json"), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+        arrays = {
+            "labels": np.asarray([str(label) for label in self.labels]),
+            "events": self.events,
+            "durations": self.durations,
+            "time_histogram": self.time_histogram,
+            "coverage": self.coverage,
+        }
+        for name in ("pixel_counts", "on_counts"):
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        np.savez_compressed(os.path.join(directory, "statistics.npz"), **arrays)
+
+        if plot:
+            try:
+                import matplotlib
+
+                matplotlib.use("Agg")
+            except ImportError:
+                return
+            self._plot(directory)
+
+    def _plot(self, directory: str):
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots()
+        ax.plot(np.arange(self.mean_rate.size) * self.bin_size, self.mean_rate)
+        ax.set(title="Mean event rate", xlabel="Time (s)", ylabel="Events / s")
+        fig.savefig(os.path.join(directory, "event_rate.png"))
+        plt.close(fig)
+
+        labels = np.asarray([str(label) for label in self.labels])
+        names = sorted(set(labels.tolist()))
+        for values, title, filename in (
+            (self.durations, "Duration (s)", "durations.png"),
+            (self.events, "Number of events", "events.png"),
+        ):
+            fig, ax = plt.subplots(figsize=(max(6, len(names) * 0.5), 4))
+            ax.boxplot([values[labels == name] for name in names])
+            ax.set_xticks(np.arange(1, len(names) + 1))
+            ax.set_xticklabels(names, rotation=90)
+            ax.set(title=title + " per label")
+            fig.tight_layout()
+            fig.savefig(os.path.join(directory, filename))
+            plt.close(fig)
+
+        if self.pixel_counts is not None:
+            fig, ax = plt.subplots()
+            if self.pixel_counts.ndim == 2:
+                image = ax.imshow(self.pixel_counts.T, origin="upper")
+                fig.colorbar(image, ax=ax)
+            else:
+                ax.bar(np.arange(self.pixel_counts.size), self.pixel_counts)
+            ax.set(title="Events per pixel" if self.pixel_counts.ndim == 2 else "Events per address")
+            fig.savefig(os.path.join(directory, "pixel_activity.png"))
+            plt.close(fig)
+
+
+def _chunk_statistics(args) -> DatasetStatistics:
+    dataset, indices, bin_size = args
+    statistics = DatasetStatistics(bin_size)
+    for index in indices:
+        statistics.add(*dataset[index])
+    return statistics
+
+
+if __name__ == "__main__":
+    import argparse
+    from ebdataset.vision import INIRoshambo, H5IBMGesture, INIUCF50, NCaltech101, NMnist, PropheseeNCars
+    from ebdataset.audio import NTidigits
+
+    available_datasets = [INIRoshambo, H5IBMGesture, INIUCF50, NCaltech101, NMnist, PropheseeNCars, NTidigits]
+    dataset_map = dict(zip([dataset.__name__ for dataset in available_datasets], available_datasets))
+
+    parser = argparse.ArgumentParser(description="Compute dataset-wide event statistics and write a report")
+    parser.add_argument("dataset", help="Dataset - One of [%s]" % " | ".join(dataset_map.keys()))
+    parser.add_argument("path", help="Path of the data directory or file for the chosen dataset")
+    parser.add_argument("-o", "--output", help="Report directory", default="statistics")
+    parser.add_argument("-w", "--num_workers", help="Number of processes", type=int, default=os.cpu_count())
+    parser.add_argument("-n", "--num_samples", help="Random subset of samples, all by default", type=int, default=None)
+    parser.add_argument("-b", "--bin_size", help="Size of the event rate bins (ms)", type=float, default=1.0)
+    parser.add_argument("--test", help="Use the test split when the dataset has one", action="store_true")
+    parser.add_argument("--no_plot", help="Don't save figures", action="store_true")
+    args = parser.parse_args()
+
+    dataset_class = dataset_map.get(args.dataset)
+    if dataset_class is None:
+        parser.error("Unknown dataset %s, expected one of [%s]" % (args.dataset, " | ".join(dataset_map.keys())))
+    if args.test and "is_train" not in inspect.signature(dataset_class.__init__).parameters:
+        parser.error("%s has no test split, run it without --test" % args.dataset)
+    kwargs = {"is_train": False} if args.test else {}
+    dataset = dataset_class(args.path, **kwargs)
+
+    indices = None
+    if args.num_samples is not None and args.num_samples < len(dataset):
+        indices = np.sort(np.random.RandomState(0x1B).choice(len(dataset), args.num_samples, replace=False))
+
+    statistics = DatasetStatistics.compute(
+        dataset, indices, bin_size=args.bin_size * 1e-3, num_workers=args.num_workers
+    )
+    statistics.save(args.output, plot=not args.no_plot)
+    print(json.dumps({key: value for key, value in statistics.summary().items() if key != "labels"}, indent=2))
+    print("Report written to %s" % args.output)
@@ -23,7 +23,11 @@ setup(
         "torchvision>=0.5.0",
         "h5py>=2.10.0",
     ],
-    python_requires=">=3.6",
+    extras_require={
+        "arrow": ["pyarrow>=1.0.0"],
+        "bci": ["scipy>=1.4.0"],
+    },
+    python_requires=">=3.8",
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Programming Language :: Python :: 3 :: Only",
@@ -0,0 +1,112 @@
+import io
+import os
+import tarfile
+import zipfile
+import pytest
+from ebdataset.utils import extract_archive, unzip
+
+_MEMBERS = {
+    "data/a.bin": b"\x00\x01" * 1000,
+    "data/0/b.bin": b"b",
+    "data/0/empty.bin": b"",
+    "data/1/deep/c.bin": os.urandom(5000),
+    "top.txt": b"top",
+}
+
+
+def _write_zip(path, members, directories=("data/2/",)):
+    with zipfile.ZipFile(path, "w") as zf:
+        for directory in directories:
+            zf.writestr(zipfile.ZipInfo(directory), b"")
+        for name, payload in members.items():
+            zf.writestr(zipfile.ZipInfo(name), payload)
+    return path
+
+
+def _write_tar(path, members, mode="w"):
+    with tarfile.open(path, mode) as tf:
+        for name, payload in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(payload)
+            tf.addfile(info, io.BytesIO(payload))
+    return path
+
+
+def _extracted(directory) -> dict:
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, directory).replace(os.sep, "/")] = f.read()
+    return files
+
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+@pytest.mark.parametrize("num_workers", [1, 3])
+def test_extract_zip(tmp_path, kind, num_workers):
+    archive = _write_zip(str(tmp_path / "archive.zip"), _MEMBERS)
+    output = tmp_path / "out"
+    stats = extract_archive(archive, str(output), verbose=False, num_workers=num_workers, kind=kind)
+    assert _extracted(output) == _MEMBERS
+    assert os.path.isdir(output / "data" / "2")  # Directory members are created
+    assert stats["files"] == len(_MEMBERS)
+    assert stats["bytes"] == sum(len(payload) for payload in _MEMBERS.values())
+
+
+@pytest.mark.parametrize("mode, extension", [("w", ".tar"), ("w:gz", ".tar.gz"), ("w:bz2", ".tar.bz2")])
+@pytest.mark.parametrize("num_workers", [1, 3])
+def test_extract_tar(tmp_path, mode, extension, num_workers):
+    archive = _write_tar(str(tmp_path / ("archive" + extension)), _MEMBERS, mode)
+    output = tmp_path / "out"
+    stats = extract_archive(archive, str(output), verbose=False, num_workers=num_workers)
+    assert _extracted(output) == _MEMBERS
+    assert stats["files"] == len(_MEMBERS)
+    assert stats["bytes"] == sum(len(payload) for payload in _MEMBERS.values())
+
+
+def test_extract_tar_skips_links(tmp_path):
+    archive = str(tmp_path / "links.tar")
+    with tarfile.open(archive, "w") as tf:
+        link = tarfile.TarInfo("link")
+        link.type = tarfile.SYMTYPE
+        link.linkname = "/etc/passwd"
+        tf.addfile(link)
+        info = tarfile.TarInfo("file.bin")
+        info.size = 1
+        tf.addfile(info, io.BytesIO(b"f"))
+    output = tmp_path / "out"
+    extract_archive(archive, str(output), verbose=False)
+    assert sorted(os.listdir(output)) == ["file.bin"]
+
+
+def test_unzip_into_existing_directory(tmp_path):
+    archive = _write_zip(str(tmp_path / "archive.zip"), _MEMBERS)
+    output = tmp_path / "out"
+    output.mkdir()
+    (output / "kept.txt").write_bytes(b"kept")
+    assert unzip(archive, str(output), verbose=False)
+    assert _extracted(output) == dict(_MEMBERS, **{"kept.txt": b"kept"})
+
+
+@pytest.mark.parametrize("name", ["../evil", "data/../../evil", "/tmp/evil_absolute"])
+@pytest.mark.parametrize("kind", ["zip", "tar"])
+def test_members_outside_the_output_are_refused(tmp_path, name, kind):
+    members = {"good.bin": b"good", name: b"evil"}
+    if kind == "zip":
+        archive = _write_zip(str(tmp_path / "evil.zip"), members, directories=())
+    else:
+        archive = _write_tar(str(tmp_path / "evil.tar"), members)
+    output = tmp_path / "nested" / "out"
+    with pytest.raises(ValueError, match="outside"):
+        extract_archive(archive, str(output), verbose=False)
+    assert not os.path.exists(tmp_path / "nested" / "evil")
+    assert not os.path.exists(tmp_path / "evil")
+    assert not os.path.exists("/tmp/evil_absolute")
+
+
+def test_unknown_archive_format(tmp_path):
+    path = tmp_path / "not_an_archive.bin"
+    path.write_bytes(b"plain bytes")
+    with pytest.raises(ValueError, match="neither a zip nor a tar"):
+        extract_archive(str(path), str(tmp_path / "out"), verbose=False)
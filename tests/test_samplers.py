@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from ebdataset.utils.samplers import BlockShuffleSampler
+
+
+def _epoch(length, epoch=0, rank=0, world_size=1, **kwargs):
+    sampler = BlockShuffleSampler(range(length), rank=rank, world_size=world_size, **kwargs)
+    sampler.set_epoch(epoch)
+    return list(sampler)
+
+
+@pytest.mark.parametrize("length", [0, 1, 63, 64, 1000])
+@pytest.mark.parametrize("block_size, buffer_size", [(1, 0), (16, 0), (16, 64), (64, 1024), (100, 7), (2048, 16)])
+def test_epoch_is_a_permutation(length, block_size, buffer_size):
+    indices = _epoch(length, block_size=block_size, buffer_size=buffer_size)
+    assert sorted(indices) == list(range(length))
+
+
+def test_seed_and_epoch_make_the_order_deterministic():
+    first = _epoch(500, epoch=3, seed=7, block_size=8, buffer_size=32)
+    assert first == _epoch(500, epoch=3, seed=7, block_size=8, buffer_size=32)
+    assert first != _epoch(500, epoch=4, seed=7, block_size=8, buffer_size=32)
+    assert first != _epoch(500, epoch=3, seed=8, block_size=8, buffer_size=32)
+
+    sampler = BlockShuffleSampler(range(500), block_size=8, buffer_size=32, seed=7)
+    sampler.set_epoch(3)
+    assert list(sampler) == list(sampler) == first
+
+
+def test_without_shuffle_the_storage_order_is_kept():
+    assert _epoch(100, shuffle=False, block_size=8, buffer_size=32) == list(range(100))
+
+
+def test_blocks_stay_contiguous_without_buffer():
+    indices = np.asarray(_epoch(100, epoch=1, block_size=8, buffer_size=0))
+    assert not np.array_equal(indices, np.arange(100))
+    for block in range(-(-100 // 8)):  # The last block is shorter
+        positions = np.flatnonzero(indices // 8 == block)
+        assert np.array_equal(np.diff(positions), np.ones(positions.size - 1))
+        assert np.array_equal(indices[positions], np.arange(block * 8, min(block * 8 + 8, 100)))
+
+
+@pytest.mark.parametrize("buffer_size", [2, 16, 128])
+def test_buffer_moves_indices_by_less_than_its_size(buffer_size):
+    blocks = _epoch(1000, epoch=2, block_size=16, buffer_size=0)
+    shuffled = _epoch(1000, epoch=2, block_size=16, buffer_size=buffer_size)
+    position = {index: i for i, index in enumerate(blocks)}
+    displacement = [abs(position[index] - i) for i, index in enumerate(shuffled)]
+    assert shuffled != blocks
+    assert max(displacement) < buffer_size
+
+
+@pytest.mark.parametrize("length", [100, 101, 103])
+@pytest.mark.parametrize("world_size", [2, 3, 4])
+def test_shards_are_disjoint(length, world_size):
+    shards = [
+        _epoch(length, epoch=1, rank=rank, world_size=world_size, drop_last=True, block_size=8, buffer_size=16)
+        for rank in range(world_size)
+    ]
+    merged = sum(shards, [])
+    assert all(len(shard) == length // world_size for shard in shards)
+    assert len(set(merged)) == len(merged)
+
+
+@pytest.mark.parametrize("length", [100, 101, 103])
+@pytest.mark.parametrize("world_size", [2, 3, 4])
+def test_padded_shards_cover_every_index(length, world_size):
+    sampler = BlockShuffleSampler(range(length), block_size=8, buffer_size=16, rank=0, world_size=world_size)
+    shards = [
+        _epoch(length, epoch=1, rank=rank, world_size=world_size, block_size=8, buffer_size=16)
+        for rank in range(world_size)
+    ]
+    merged = sum(shards, [])
+    assert all(len(shard) == len(sampler) == -(-length // world_size) for shard in shards)
+    assert set(merged) == set(range(length))
+    assert len(merged) - len(set(merged)) == len(merged) - length  # Only the padding is repeated
@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from torch.utils.data import DataLoader
+from ebdataset.generated.parity import ParityTask
+from ebdataset.utils import sharding
+from ebdataset.utils.sharding import (
+    ShardInfo,
+    ShardedIterableDataset,
+    ShardedSampler,
+    get_shard_info,
+    shard_indices,
+)
+from ebdataset.utils.units import ms
+
+
+def _simulate(monkeypatch, rank: int, world_size: int, worker_id: int = None, num_workers: int = None):
+    """Run as the given distributed rank and, with worker_id, as a DataLoader worker"""
+    monkeypatch.setenv("RANK", str(rank))
+    monkeypatch.setenv("WORLD_SIZE", str(world_size))
+    worker_info = None if worker_id is None else SimpleNamespace(id=worker_id, num_workers=num_workers)
+    monkeypatch.setattr(sharding.data, "get_worker_info", lambda: worker_info)
+
+
+def _all_shards(world_size: int, num_workers: int):
+    return [
+        ShardInfo(rank, world_size, worker, num_workers) for rank in range(world_size) for worker in range(num_workers)
+    ]
+
+
+def test_get_shard_info_single_process(monkeypatch):
+    monkeypatch.delenv("RANK", raising=False)
+    monkeypatch.delenv("WORLD_SIZE", raising=False)
+    shard = get_shard_info()
+    assert shard == ShardInfo(0, 1, 0, 1)
+    assert (shard.index, shard.count) == (0, 1)
+
+
+def test_get_shard_info_from_environment_and_worker(monkeypatch):
+    _simulate(monkeypatch, rank=1, world_size=3, worker_id=2, num_workers=4)
+    shard = get_shard_info()
+    assert shard == ShardInfo(1, 3, 2, 4)
+    assert (shard.index, shard.count) == (6, 12)
+
+
+def test_get_shard_info_overrides(monkeypatch):
+    _simulate(monkeypatch, rank=1, world_size=3)
+    assert get_shard_info(rank=0, world_size=2) == ShardInfo(0, 2, 0, 1)
+    with pytest.raises(AssertionError):
+        get_shard_info(rank=2, world_size=2)
+
+
+@pytest.mark.parametrize("length", [0, 1, 7, 100, 101])
+@pytest.mark.parametrize("world_size, num_workers", [(1, 1), (1, 3), (2, 1), (3, 2), (4, 4)])
+def test_shard_indices_disjoint_and_complete(length, world_size, num_workers):
+    parts = [shard_indices(length, shard, epoch=3, seed=5) for shard in _all_shards(world_size, num_workers)]
+    merged = np.concatenate(parts)
+    assert merged.size == length
+    assert np.array_equal(np.sort(merged), np.arange(length))
+    sizes = [part.size for part in parts]
+    assert max(sizes) - min(sizes) <= 1  # Uneven splits differ by at most one sample
+
+
+def test_shard_indices_deterministic_per_epoch():
+    shard = ShardInfo(1, 2, 0, 2)
+    assert np.array_equal(shard_indices(50, shard, epoch=1, seed=2), shard_indices(50, shard, epoch=1, seed=2))
+    assert not np.array_equal(shard_indices(50, shard, epoch=1, seed=2), shard_indices(50, shard, epoch=2, seed=2))
+    unshuffled = shard_indices(50, shard, shuffle=False)
+    assert np.array_equal(unshuffled, np.arange(50)[shard.index :: shard.count])
+
+
+@pytest.mark.parametrize("length", [10, 11, 13])
+@pytest.mark.parametrize("world_size", [1, 2, 3, 4])
+def test_sharded_sampler_drop_last_is_disjoint(length, world_size):
+    parts = []
+    for rank in range(world_size):
+        sampler = ShardedSampler(range(length), drop_last=True, rank=rank, world_size=world_size)
+        sampler.set_epoch(2)
+        parts.append(list(sampler))
+        assert len(parts[-1]) == len(sampler) == length // world_size
+    merged = sum(parts, [])
+    assert len(set(merged)) == len(merged)
+
+
+@pytest.mark.parametrize("length", [10, 11, 13])
+@pytest.mark.parametrize("world_size", [1, 2, 3, 4])
+def test_sharded_sampler_pads_uneven_splits(length, world_size):
+    parts = [list(ShardedSampler(range(length), rank=rank, world_size=world_size)) for rank in range(world_size)]
+    assert all(len(part) == -(-length // world_size) for part in parts)
+    merged = sum(parts, [])
+    assert set(merged) == set(range(length))
+    assert len(merged) - len(set(merged)) == len(merged) - length  # Only the padding is repeated
+
+
+def test_sharded_sampler_epochs(monkeypatch):
+    _simulate(monkeypatch, rank=0, world_size=1)
+    sampler = ShardedSampler(range(30), seed=1)
+    first = list(sampler)
+    assert first == list(sampler)
+    sampler.set_epoch(1)
+    assert first != list(sampler)
+    assert list(ShardedSampler(range(30), shuffle=False)) == list(range(30))
+
+
+@pytest.mark.parametrize("world_size, num_workers", [(1, 2), (2, 1), (2, 3), (3, 2)])
+def test_sharded_iterable_dataset_shards(monkeypatch, world_size, num_workers):
+    samples = []
+    for rank in range(world_size):
+        for worker_id in range(num_workers):
+            _simulate(monkeypatch, rank, world_size, worker_id, num_workers)
+            dataset = ShardedIterableDataset(list(range(23)), seed=4)
+            dataset.set_epoch(1)
+            samples += list(dataset)
+    assert sorted(samples) == list(range(23))
+
+
+def test_sharded_iterable_dataset_with_dataloader_workers():
+    dataset = ShardedIterableDataset(list(range(17)), rank=0, world_size=1)
+    loaded = [int(sample) for sample in DataLoader(dataset, batch_size=None, num_workers=2)]
+    assert sorted(loaded) == list(range(17))
+
+
+def _parity_samples(task):
+    return [(sample.addr.tolist(), sample.ts.tolist(), int(label)) for sample, label in task]
+
+
+def _parity_task(max_iter):
+    return ParityTask(max_iter=max_iter, sample_duration=100 * ms, duration_per_bit=50 * ms, features_per_bit=2)
+
+
+def test_parity_task_splits_max_iter_between_shards(monkeypatch):
+    counts = []
+    for rank in range(2):
+        for worker_id in range(3):
+            _simulate(monkeypatch, rank, 2, worker_id, 3)
+            counts.append(len(_parity_samples(_parity_task(max_iter=10))))
+    assert sum(counts) == 10
+    assert max(counts) - min(counts) <= 1
+
+
+def test_parity_task_reseeding_is_deterministic(monkeypatch):
+    _simulate(monkeypatch, 1, 2, 0, 2)
+    task = _parity_task(max_iter=12)
+    task.set_epoch(0)
+    first = _parity_samples(task)
+    assert first == _parity_samples(task)  # Every iteration of an epoch restarts the same stream
+    task.set_epoch(1)
+    assert _parity_samples(task) != first
+
+    _simulate(monkeypatch, 0, 2, 0, 2)
+    task.set_epoch(0)
+    assert _parity_samples(task) != first  # Every shard has its own stream